@@ -0,0 +1,65 @@
+# Сравнение маппинга строк результата в модели аккаунта: прежний по именам атрибутов и позиционный
+# Запуск из корня репозитория: python .github/scripts/benchmarks/account_mapper.py
+import sys
+import timeit
+from collections import namedtuple
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[3]))
+
+from internal import model  # noqa: E402
+
+ROWS = 1000
+REPEAT = 5
+NUMBER = 200
+
+# Строки драйвера ведут себя как именованные кортежи: доступ и по имени, и по позиции
+AccountRow = namedtuple("AccountRow", ["id", "login", "password", "google_two_fa_key", "created_at"])
+CredentialsRow = namedtuple("CredentialsRow", ["id", "password", "google_two_fa_key"])
+
+
+@dataclass
+class OldAccount:
+    id: int
+
+    login: str
+    password: str
+    google_two_fa_key: str
+
+    created_at: datetime
+
+    @classmethod
+    def serialize(cls, rows) -> list["OldAccount"]:
+        return [
+            cls(
+                id=row.id,
+                login=row.login,
+                password=row.password,
+                google_two_fa_key=row.google_two_fa_key,
+                created_at=row.created_at,
+            )
+            for row in rows
+        ]
+
+
+def main() -> None:
+    now = datetime.now()
+    account_rows = [AccountRow(i, f"login{i}", "$2b$12$" + "x" * 53, "JBSWY3DPEHPK3PXP", now) for i in range(ROWS)]
+    credentials_rows = [CredentialsRow(row.id, row.password, row.google_two_fa_key) for row in account_rows]
+
+    cases = [
+        ("OldAccount.serialize (по атрибутам)", lambda: OldAccount.serialize(account_rows)),
+        ("OldAccount(**row._asdict())", lambda: [OldAccount(**row._asdict()) for row in account_rows]),
+        ("Account.serialize (позиционно)", lambda: model.Account.serialize(account_rows)),
+        ("AccountCredentials.serialize", lambda: model.AccountCredentials.serialize(credentials_rows)),
+    ]
+    print(f"{ROWS} строк, лучшее из {REPEAT} x {NUMBER}")
+    for name, case in cases:
+        best = min(timeit.repeat(case, repeat=REPEAT, number=NUMBER)) / NUMBER / ROWS
+        print(f"{name:40} {best * 1e9:8.0f} нс/строка")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+# Накладные расходы HTTP middleware (trace -> logger -> authorization) на запрос в сравнении с голым приложением
+# Запуск из корня репозитория: python .github/scripts/benchmarks/http_middleware.py
+import asyncio
+import sys
+import time
+from contextvars import ContextVar
+from pathlib import Path
+
+from fastapi import FastAPI, Request
+from opentelemetry.sdk.metrics import MeterProvider
+from opentelemetry.sdk.trace import TracerProvider
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[3]))
+
+from internal import model  # noqa: E402
+from internal.app.http.app import include_middleware  # noqa: E402
+from internal.controller.http.middlerware.middleware import HttpMiddleware  # noqa: E402
+
+REQUESTS = 5000
+WARMUP = 200
+PREFIX = "/api/account"
+
+
+class _NullLogger:
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
+
+
+class _BenchTelemetry:
+    # SDK-провайдеры без экспортеров: спаны и метрики создаются, но никуда не отправляются
+    def __init__(self):
+        self._tracer = TracerProvider().get_tracer("benchmark")
+        self._meter = MeterProvider().get_meter("benchmark")
+
+    def tracer(self):
+        return self._tracer
+
+    def meter(self):
+        return self._meter
+
+    def logger(self):
+        return _NullLogger()
+
+
+class _AuthorizationCache:
+    async def check_authorization(self, access_token: str) -> model.AuthorizationData:
+        return model.AuthorizationData(account_id=1, two_fa_status=False, role="user", message="", status_code=200)
+
+
+def app_with_middleware() -> FastAPI:
+    app = FastAPI()
+    # Логгер-заглушка контекст не читает, middleware только выставляет его на время запроса
+    http_middleware = HttpMiddleware(_BenchTelemetry(), _AuthorizationCache(), PREFIX, ContextVar("log_context"))
+    include_middleware(app, http_middleware)
+
+    async def handler(request: Request):
+        return {"id": request.state.authorization_data.account_id}
+
+    app.add_api_route(f"{PREFIX}/bench", handler, methods=["GET"])
+    return app
+
+
+def bare_app() -> FastAPI:
+    app = FastAPI()
+
+    async def handler():
+        return {"id": 1}
+
+    app.add_api_route(f"{PREFIX}/bench", handler, methods=["GET"])
+    return app
+
+
+async def measure(app: FastAPI) -> float:
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": f"{PREFIX}/bench",
+        "raw_path": f"{PREFIX}/bench".encode(),
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"host", b"bench"), (b"cookie", b"Access-Token=token")],
+        "client": ("127.0.0.1", 1),
+        "server": ("bench", 80),
+    }
+    statuses = set()
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            statuses.add(message["status"])
+
+    for _ in range(WARMUP):
+        await app(dict(scope), receive, send)
+    started_at = time.perf_counter()
+    for _ in range(REQUESTS):
+        await app(dict(scope), receive, send)
+    elapsed = time.perf_counter() - started_at
+
+    if statuses != {200}:
+        raise RuntimeError(f"неожиданные статусы ответа: {statuses}")
+    return elapsed / REQUESTS
+
+
+async def main() -> None:
+    with_middleware, bare = app_with_middleware(), bare_app()
+    print(f"{REQUESTS} запросов через ASGI-интерфейс приложения")
+    for _ in range(3):
+        middleware_time, bare_time = await measure(with_middleware), await measure(bare)
+        print(f"с middleware: {middleware_time * 1e6:6.1f} мкс/запрос", end="   ")
+        print(f"без middleware: {bare_time * 1e6:6.1f} мкс/запрос")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,60 @@
+# Стоимость логирования на запрос при разных LOG_LEVEL: 4 строки INFO (auto_log контроллера и сервиса) внутри спана
+# Запуск из корня репозитория: python .github/scripts/benchmarks/logger_level.py
+import sys
+import time
+from contextvars import ContextVar
+from pathlib import Path
+
+from opentelemetry.sdk._logs import LoggerProvider
+from opentelemetry.sdk._logs.export import BatchLogRecordProcessor, LogRecordExporter, LogRecordExportResult
+from opentelemetry.sdk.trace import TracerProvider
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[3]))
+
+from infrastructure.telemetry.logger import OtelLogger  # noqa: E402
+
+REQUESTS = 20000
+WARMUP = 500
+
+
+class _NullExporter(LogRecordExporter):
+    def export(self, batch):
+        return LogRecordExportResult.SUCCESS
+
+    def shutdown(self):
+        pass
+
+    def force_flush(self, timeout_millis: int = 0) -> bool:
+        return True
+
+
+def request(logger: OtelLogger) -> None:
+    for _ in range(4):
+        logger.info("Начало AccountController.login", {"account.id": 1})
+
+
+def main() -> None:
+    logger_provider = LoggerProvider()
+    logger_provider.add_log_record_processor(BatchLogRecordProcessor(_NullExporter(), max_queue_size=100000))
+    tracer = TracerProvider().get_tracer("benchmark")
+
+    log_context = ContextVar("log_context")
+    log_context.set({"account.id": "1", "http.request.method": "POST", "url.path": "/api/account/login"})
+
+    print(f"{REQUESTS} запросов по 4 строки INFO")
+    for log_level in ("INFO", "WARNING"):
+        logger = OtelLogger(None, logger_provider, "benchmark", log_context, log_level=log_level)
+        with tracer.start_as_current_span("request"):
+            for _ in range(WARMUP):
+                request(logger)
+            started_at = time.perf_counter()
+            for _ in range(REQUESTS):
+                request(logger)
+            elapsed = time.perf_counter() - started_at
+        print(f"LOG_LEVEL={log_level:8} {elapsed / REQUESTS * 1e6:7.1f} мкс/запрос")
+
+    logger_provider.shutdown()
+
+
+if __name__ == "__main__":
+    main()
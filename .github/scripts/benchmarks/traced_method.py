@@ -0,0 +1,54 @@
+# Накладные расходы traced_method на вызов сверх недекорированного метода, для записываемых и несемплированных спанов
+# Запуск из корня репозитория: python .github/scripts/benchmarks/traced_method.py
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.sampling import ALWAYS_OFF, ALWAYS_ON, Sampler
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[3]))
+
+from pkg.trace_wrapper import traced_method  # noqa: E402
+
+CALLS = 50000
+WARMUP = 1000
+
+
+def make_repo(sampler: Sampler):
+    class Repo:
+        tracer = TracerProvider(sampler=sampler).get_tracer("benchmark")
+
+        @traced_method()
+        async def update_password_if_unchanged(
+            self, account_id: int, old_password: str, new_password: str, tx=None
+        ) -> bool:
+            return True
+
+        async def undecorated(self, account_id: int, old_password: str, new_password: str, tx=None) -> bool:
+            return True
+
+    return Repo()
+
+
+async def measure(method) -> float:
+    for _ in range(WARMUP):
+        await method(1, "old", new_password="new")
+    started_at = time.perf_counter()
+    for _ in range(CALLS):
+        await method(1, "old", new_password="new")
+    return (time.perf_counter() - started_at) / CALLS
+
+
+async def main() -> None:
+    print(f"{CALLS} вызовов, лучшее из 3")
+    for name, sampler in (("записываемый спан", ALWAYS_ON), ("несемплированный спан", ALWAYS_OFF)):
+        repo = make_repo(sampler)
+        base = await measure(repo.undecorated)
+        overhead = min([await measure(repo.update_password_if_unchanged) - base for _ in range(3)])
+        print(f"{name:22} +{overhead * 1e6:6.2f} мкс/вызов (без декоратора {base * 1e6:.2f} мкс)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
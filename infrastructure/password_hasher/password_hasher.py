@@ -0,0 +1,126 @@
+import asyncio
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+
+import bcrypt
+from opentelemetry.metrics import CallbackOptions, Observation
+
+from internal import interface
+
+
+def _hash(password: bytes, cost: int, submitted_at: float) -> tuple[bytes, float]:
+    started_at = time.monotonic()
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds=cost)), started_at - submitted_at
+
+
+def _verify(password: bytes, hashed_password: bytes, submitted_at: float) -> tuple[bool, float]:
+    started_at = time.monotonic()
+    return bcrypt.checkpw(password, hashed_password), started_at - submitted_at
+
+
+def calibrate_cost(target_duration: float, min_cost: int = 10, max_cost: int = 14) -> tuple[int, float]:
+    # Каждый шаг стоимости удваивает время хеширования, поэтому поднимаемся,
+    # пока следующий шаг укладывается в бюджет
+    cost = min_cost
+    duration = _measure(cost)
+    while cost < max_cost and duration * 2 <= target_duration:
+        cost += 1
+        duration = _measure(cost)
+
+    if duration > target_duration and cost > min_cost:
+        cost -= 1
+    return cost, duration
+
+
+def _measure(cost: int) -> float:
+    started_at = time.perf_counter()
+    bcrypt.hashpw(b"calibration-password", bcrypt.gensalt(rounds=cost))
+    return time.perf_counter() - started_at
+
+
+class PasswordHasher(interface.IPasswordHasher):
+    def __init__(
+        self,
+        tel: interface.ITelemetry,
+        backend: str = "thread",
+        max_workers: int = 4,
+        cost: int = 12,
+    ):
+        if backend not in ("thread", "process"):
+            raise ValueError(f"unknown password hasher backend: {backend}")
+
+        self.backend = backend
+        self.max_workers = max_workers
+        self.cost = cost
+        self.logger = tel.logger()
+        self.executor = self._create_executor()
+
+        # Задачи, отправленные в пул, но еще не завершенные
+        self._pending = 0
+
+        meter = tel.meter()
+        self.wait_duration = meter.create_histogram(
+            "password_hasher.wait.duration",
+            unit="s",
+            description="Время ожидания задачи хеширования в очереди пула",
+        )
+        self.execution_duration = meter.create_histogram(
+            "password_hasher.execution.duration",
+            unit="s",
+            description="Полное время выполнения задачи хеширования",
+        )
+        self.verified_cost = meter.create_counter(
+            "password_hasher.verified.cost",
+            description="Количество проверенных хешей в разбивке по стоимости bcrypt",
+        )
+        meter.create_observable_gauge(
+            "password_hasher.queue.depth",
+            callbacks=[self._observe_queue_depth],
+            description="Количество задач хеширования, ожидающих свободного воркера",
+        )
+
+    async def hash(self, password: str) -> str:
+        hashed_password = await self._submit("hash", _hash, password.encode("utf-8"), self.cost)
+        return hashed_password.decode("utf-8")
+
+    async def verify(self, hashed_password: str, password: str) -> bool:
+        self.verified_cost.add(1, {"cost": self._cost_of(hashed_password)})
+        return await self._submit("verify", _verify, password.encode("utf-8"), hashed_password.encode("utf-8"))
+
+    def needs_rehash(self, hashed_password: str) -> bool:
+        # Только вверх: понижение стоимости ослабило бы хеш, а при разной стоимости в процессах хеш бы перескакивал
+        return self._cost_of(hashed_password) < self.cost
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+    async def _submit(self, operation: str, func, *args):
+        loop = asyncio.get_running_loop()
+        attributes = {"operation": operation, "backend": self.backend}
+
+        self._pending += 1
+        submitted_at = time.monotonic()
+        try:
+            result, wait_duration = await loop.run_in_executor(self.executor, func, *args, submitted_at)
+        finally:
+            self._pending -= 1
+
+        self.wait_duration.record(wait_duration, attributes)
+        self.execution_duration.record(time.monotonic() - submitted_at, attributes)
+        return result
+
+    @staticmethod
+    def _cost_of(hashed_password: str) -> int:
+        # Формат хеша: $2b$<cost>$<salt+hash>
+        try:
+            return int(hashed_password.split("$")[2])
+        except (IndexError, ValueError):
+            return 0
+
+    def _create_executor(self) -> Executor:
+        if self.backend == "process":
+            return ProcessPoolExecutor(max_workers=self.max_workers)
+        return ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="password-hasher")
+
+    def _observe_queue_depth(self, options: CallbackOptions):
+        yield Observation(max(self._pending - self.max_workers, 0), {"backend": self.backend})
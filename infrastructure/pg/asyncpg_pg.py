@@ -0,0 +1,281 @@
+import asyncio
+import re
+import time
+from collections.abc import AsyncIterator, Sequence
+from contextlib import asynccontextmanager
+from typing import Any
+
+import asyncpg
+from opentelemetry.metrics import CallbackOptions, Observation
+
+from internal import interface
+
+# Именованные параметры вида :name, не задевая приведение типов ::text
+_NAMED_PARAM = re.compile(r"(?<!:):([a-zA-Z_][a-zA-Z0-9_]*)")
+
+
+class _PreparedConnection(asyncpg.Connection):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared_statements: dict[str, asyncpg.prepared_stmt.PreparedStatement] = {}
+
+
+class AsyncpgPG(interface.IDB):
+    def __init__(
+        self,
+        tel: interface.ITelemetry,
+        db_user,
+        db_pass,
+        db_host,
+        db_port,
+        db_name,
+        prepared_queries: dict[str, str] = None,
+        pool_size: int = 15,
+        max_overflow: int = 15,
+        pool_recycle: int = 300,
+        pool_timeout: int = 30,
+    ):
+        self.dsn = f"postgresql://{db_user}:{db_pass}@{db_host}:{db_port}/{db_name}"
+        self.pool_size = pool_size
+        self.max_overflow = max_overflow
+        self.pool_recycle = pool_recycle
+        self.pool_timeout = pool_timeout
+        self.tracer = tel.tracer()
+
+        # Запрос в формате SQLAlchemy -> (запрос с позиционными параметрами, порядок параметров)
+        self._compiled: dict[str, tuple[str, list[str]]] = {}
+        # Запрос с позиционными параметрами -> имя для атрибута метрики
+        self.query_names = {self._compile(query)[0]: name for name, query in (prepared_queries or {}).items()}
+        self.prepared_queries = list(self.query_names)
+
+        self._pool: asyncpg.Pool | None = None
+        self._pool_lock = asyncio.Lock()
+        self._closing = False
+
+        self._setup_metrics(tel.meter())
+
+    async def insert(self, query: str, query_params: dict) -> int | None:
+        sql, args = self._bind(query, query_params)
+        async with self._acquire() as conn:
+            row = await self._fetchrow(conn, sql, args)
+            return row[0] if row else None
+
+    async def delete(self, query: str, query_params: dict) -> None:
+        sql, args = self._bind(query, query_params)
+        async with self._acquire() as conn:
+            await self._execute(conn, sql, args)
+
+    async def update(self, query: str, query_params: dict) -> Sequence[Any]:
+        sql, args = self._bind(query, query_params)
+        async with self._acquire() as conn:
+            return await self._fetch(conn, sql, args)
+
+    async def select(self, query: str, query_params: dict) -> Sequence[Any]:
+        sql, args = self._bind(query, query_params)
+        async with self._acquire() as conn:
+            return await self._fetch(conn, sql, args)
+
+    async def multi_query(self, queries: list[str]) -> None:
+        async with self._acquire() as conn:
+            async with conn.transaction():
+                for query in queries:
+                    await conn.execute(query)
+        return None
+
+    async def multi_query_autocommit(self, queries: list[str]) -> None:
+        async with self._acquire() as conn:
+            for query in queries:
+                await conn.execute(query)
+        return None
+
+    @asynccontextmanager
+    async def transaction(self) -> AsyncIterator["AsyncpgTransaction"]:
+        async with self._acquire() as conn:
+            async with conn.transaction():
+                yield AsyncpgTransaction(self, conn)
+
+    async def warmup(self, connections: int) -> None:
+        # Новые соединения сразу подготавливают горячие запросы в _prepare_statements
+        pool = await self._get_pool()
+        opened = await asyncio.gather(*[pool.acquire() for _ in range(connections)], return_exceptions=True)
+        for conn in opened:
+            if not isinstance(conn, BaseException):
+                await pool.release(conn)
+
+        errors = [conn for conn in opened if isinstance(conn, BaseException)]
+        if errors:
+            raise errors[0]
+
+    async def close(self) -> None:
+        self._closing = True
+        if self._pool is not None:
+            await self._pool.close()
+
+    @asynccontextmanager
+    async def _acquire(self) -> AsyncIterator[_PreparedConnection]:
+        pool = await self._get_pool()
+        started_at = time.perf_counter()
+        conn = await pool.acquire(timeout=self.pool_timeout)
+        self.checkout_duration.record(time.perf_counter() - started_at)
+        try:
+            yield conn
+        finally:
+            await pool.release(conn)
+
+    async def _fetch(self, conn, sql: str, args: list) -> list[asyncpg.Record]:
+        started_at = time.perf_counter()
+        try:
+            statement = conn.prepared_statements.get(sql)
+            if statement is not None:
+                return await statement.fetch(*args)
+            return await conn.fetch(sql, *args)
+        finally:
+            self._record_query(sql, started_at)
+
+    async def _execute(self, conn, sql: str, args: list) -> None:
+        started_at = time.perf_counter()
+        try:
+            statement = conn.prepared_statements.get(sql)
+            if statement is not None:
+                await statement.fetch(*args)
+            else:
+                await conn.execute(sql, *args)
+        finally:
+            self._record_query(sql, started_at)
+
+    async def _fetchrow(self, conn, sql: str, args: list) -> Any:
+        started_at = time.perf_counter()
+        try:
+            statement = conn.prepared_statements.get(sql)
+            if statement is not None:
+                return await statement.fetchrow(*args)
+            return await conn.fetchrow(sql, *args)
+        finally:
+            self._record_query(sql, started_at)
+
+    def _record_query(self, sql: str, started_at: float) -> None:
+        self.query_duration.record(time.perf_counter() - started_at, {"db.query.name": self._query_name(sql)})
+
+    def _query_name(self, sql: str) -> str:
+        name = self.query_names.get(sql)
+        if name is None:
+            # Незарегистрированные запросы группируем по типу операции
+            name = sql.split(None, 1)[0].upper() if sql.strip() else "unknown"
+            self.query_names[sql] = name
+        return name
+
+    async def _get_pool(self) -> asyncpg.Pool:
+        if self._pool is None:
+            async with self._pool_lock:
+                if self._pool is None:
+                    # Аналога pool_recycle по возрасту в asyncpg нет: соединение закрывается после
+                    # pool_recycle секунд простоя и переоткрывается при следующем запросе
+                    self._pool = await asyncpg.create_pool(
+                        self.dsn,
+                        min_size=1,
+                        max_size=self.pool_size + self.max_overflow,
+                        max_inactive_connection_lifetime=self.pool_recycle,
+                        connection_class=_PreparedConnection,
+                        init=self._init_connection,
+                    )
+        return self._pool
+
+    async def _init_connection(self, conn: _PreparedConnection) -> None:
+        self.connections_created.add(1)
+        conn.add_termination_listener(self._on_connection_closed)
+
+        # Горячие запросы подготавливаются один раз на каждое новое соединение пула
+        for sql in self.prepared_queries:
+            conn.prepared_statements[sql] = await conn.prepare(sql)
+
+    def _on_connection_closed(self, conn: asyncpg.Connection) -> None:
+        # Закрытое до остановки сервиса соединение пул переоткроет: простой дольше pool_recycle или обрыв
+        if not self._closing:
+            self.connections_recycled.add(1)
+
+    def _setup_metrics(self, meter) -> None:
+        # Те же метрики, что у PG, чтобы дашборды не зависели от выбранного движка
+        self.checkout_duration = meter.create_histogram(
+            "db.client.connection.wait_time",
+            unit="s",
+            description="Время ожидания соединения из пула",
+        )
+        self.query_duration = meter.create_histogram(
+            "db.client.operation.duration",
+            unit="s",
+            description="Время выполнения запроса",
+        )
+        self.connections_created = meter.create_counter(
+            "db.client.connection.created",
+            description="Количество новых соединений с БД",
+        )
+        self.connections_recycled = meter.create_counter(
+            "db.client.connection.recycled",
+            description="Количество переоткрытых соединений (recycle, invalidate)",
+        )
+        meter.create_observable_gauge(
+            "db.client.connection.count",
+            callbacks=[self._observe_connections],
+            description="Количество соединений пула по состоянию",
+        )
+        meter.create_observable_gauge(
+            "db.client.connection.overflow",
+            callbacks=[self._observe_overflow],
+            description="Количество соединений сверх pool_size",
+        )
+
+    def _observe_connections(self, options: CallbackOptions):
+        if self._pool is None:
+            return
+        idle = self._pool.get_idle_size()
+        yield Observation(self._pool.get_size() - idle, {"state": "used"})
+        yield Observation(idle, {"state": "idle"})
+
+    def _observe_overflow(self, options: CallbackOptions):
+        if self._pool is None:
+            return
+        yield Observation(max(self._pool.get_size() - self.pool_size, 0))
+
+    def _bind(self, query: str, query_params: dict) -> tuple[str, list]:
+        sql, param_names = self._compile(query)
+        return sql, [query_params[name] for name in param_names]
+
+    def _compile(self, query: str) -> tuple[str, list[str]]:
+        compiled = self._compiled.get(query)
+        if compiled is not None:
+            return compiled
+
+        param_names: list[str] = []
+
+        def replace(match: re.Match) -> str:
+            name = match.group(1)
+            if name not in param_names:
+                param_names.append(name)
+            return f"${param_names.index(name) + 1}"
+
+        compiled = (_NAMED_PARAM.sub(replace, query), param_names)
+        self._compiled[query] = compiled
+        return compiled
+
+
+class AsyncpgTransaction(interface.ITransaction):
+    def __init__(self, db: AsyncpgPG, conn: asyncpg.Connection):
+        self.db = db
+        self.conn = conn
+
+    async def insert(self, query: str, query_params: dict) -> int | None:
+        sql, args = self.db._bind(query, query_params)
+        row = await self.db._fetchrow(self.conn, sql, args)
+        return row[0] if row else None
+
+    async def delete(self, query: str, query_params: dict) -> None:
+        sql, args = self.db._bind(query, query_params)
+        await self.db._execute(self.conn, sql, args)
+
+    async def update(self, query: str, query_params: dict) -> Sequence[Any]:
+        sql, args = self.db._bind(query, query_params)
+        return await self.db._fetch(self.conn, sql, args)
+
+    async def select(self, query: str, query_params: dict) -> Sequence[Any]:
+        sql, args = self.db._bind(query, query_params)
+        return await self.db._fetch(self.conn, sql, args)
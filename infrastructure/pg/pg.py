@@ -1,51 +1,107 @@
-from collections.abc import Sequence
+import asyncio
+import time
+from collections.abc import AsyncIterator, Sequence
+from contextlib import asynccontextmanager
 from typing import Any
 
-from sqlalchemy import text
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from opentelemetry.metrics import CallbackOptions, Observation
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession, async_sessionmaker, create_async_engine
 
 from internal import interface
 
 
-def NewPool(db_user, db_pass, db_host, db_port, db_name):
+def NewPool(
+    db_user, db_pass, db_host, db_port, db_name, pool_size=15, max_overflow=15, pool_recycle=300, pool_timeout=30
+):
     async_engine = create_async_engine(
         f"postgresql+asyncpg://{db_user}:{db_pass}@{db_host}:{db_port}/{db_name}",
         echo=False,
         future=True,
-        pool_size=15,
-        max_overflow=15,
-        pool_recycle=300,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_recycle=pool_recycle,
+        pool_timeout=pool_timeout,
     )
 
     pool = async_sessionmaker(bind=async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
     return pool
 
 
+class PGTransaction(interface.ITransaction):
+    def __init__(self, db: "PG", session: AsyncSession):
+        self.db = db
+        self.session = session
+
+    async def insert(self, query: str, query_params: dict) -> int | None:
+        result = await self.db._execute(self.session, query, query_params)
+        rows = result.all()
+        return rows[0][0] if rows else None
+
+    async def delete(self, query: str, query_params: dict) -> None:
+        await self.db._execute(self.session, query, query_params)
+
+    async def update(self, query: str, query_params: dict) -> Sequence[Any]:
+        result = await self.db._execute(self.session, query, query_params)
+        return result.all() if result.returns_rows else []
+
+    async def select(self, query: str, query_params: dict) -> Sequence[Any]:
+        result = await self.db._execute(self.session, query, query_params)
+        return result.all()
+
+
 class PG(interface.IDB):
-    def __init__(self, tel: interface.ITelemetry, db_user, db_pass, db_host, db_port, db_name):
-        self.pool = NewPool(db_user, db_pass, db_host, db_port, db_name)
+    def __init__(
+        self,
+        tel: interface.ITelemetry,
+        db_user,
+        db_pass,
+        db_host,
+        db_port,
+        db_name,
+        pool_size: int = 15,
+        max_overflow: int = 15,
+        pool_recycle: int = 300,
+        pool_timeout: int = 30,
+        query_names: dict[str, str] = None,
+    ):
+        self.pool = NewPool(
+            db_user, db_pass, db_host, db_port, db_name, pool_size, max_overflow, pool_recycle, pool_timeout
+        )
+        self.engine = self.pool.kw["bind"]
         self.tracer = tel.tracer()
 
-    async def insert(self, query: str, query_params: dict) -> int:
+        # Текст запроса -> имя для атрибута метрики
+        self.query_names = {query: name for name, query in (query_names or {}).items()}
+
+        self._setup_metrics(tel.meter())
+
+    async def insert(self, query: str, query_params: dict) -> int | None:
         async with self.pool() as session:
-            result = await session.execute(text(query), query_params)
+            await self._checkout(session)
+            result = await self._execute(session, query, query_params)
             await session.commit()
             rows = result.all()
-            return rows[0][0]
+            return rows[0][0] if rows else None
 
     async def delete(self, query: str, query_params: dict) -> None:
         async with self.pool() as session:
-            await session.execute(text(query), query_params)
+            await self._checkout(session)
+            await self._execute(session, query, query_params)
             await session.commit()
 
-    async def update(self, query: str, query_params: dict) -> None:
+    async def update(self, query: str, query_params: dict) -> Sequence[Any]:
         async with self.pool() as session:
-            await session.execute(text(query), query_params)
+            await self._checkout(session)
+            result = await self._execute(session, query, query_params)
             await session.commit()
+            # Строки есть только у UPDATE ... RETURNING
+            return result.all() if result.returns_rows else []
 
     async def select(self, query: str, query_params: dict) -> Sequence[Any]:
         async with self.pool() as session:
-            result = await session.execute(text(query), query_params)
+            await self._checkout(session)
+            result = await self._execute(session, query, query_params)
             rows = result.all()
             return rows
 
@@ -55,3 +111,108 @@ class PG(interface.IDB):
                 await session.execute(text(query))
             await session.commit()
         return None
+
+    async def multi_query_autocommit(self, queries: list[str]) -> None:
+        # Каждый запрос выполняется вне транзакции, это нужно для CREATE INDEX CONCURRENTLY
+        async with self.engine.connect() as conn:
+            conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+            for query in queries:
+                await conn.execute(text(query))
+        return None
+
+    @asynccontextmanager
+    async def transaction(self) -> AsyncIterator[PGTransaction]:
+        # Все запросы внутри выполняются на одном соединении, commit при выходе, rollback при исключении
+        async with self.pool() as session:
+            async with session.begin():
+                await self._checkout(session)
+                yield PGTransaction(self, session)
+
+    async def warmup(self, connections: int) -> None:
+        # Соединения держим одновременно, иначе пул отдаст одно и то же; после закрытия они возвращаются в пул
+        async def ping(conn: AsyncConnection) -> None:
+            await conn.execute(text("SELECT 1"))
+
+        opened = await asyncio.gather(*[self.engine.connect() for _ in range(connections)], return_exceptions=True)
+        conns = [conn for conn in opened if isinstance(conn, AsyncConnection)]
+        try:
+            await asyncio.gather(*[ping(conn) for conn in conns])
+        finally:
+            for conn in conns:
+                await conn.close()
+
+        errors = [conn for conn in opened if isinstance(conn, BaseException)]
+        if errors:
+            raise errors[0]
+
+    async def close(self) -> None:
+        await self.engine.dispose()
+
+    async def _checkout(self, session: AsyncSession) -> None:
+        # Сессия берет соединение из пула лениво, явный запрос позволяет измерить ожидание
+        started_at = time.perf_counter()
+        await session.connection()
+        self.checkout_duration.record(time.perf_counter() - started_at)
+
+    async def _execute(self, session: AsyncSession, query: str, query_params: dict):
+        started_at = time.perf_counter()
+        try:
+            return await session.execute(text(query), query_params)
+        finally:
+            self.query_duration.record(time.perf_counter() - started_at, {"db.query.name": self._query_name(query)})
+
+    def _query_name(self, query: str) -> str:
+        name = self.query_names.get(query)
+        if name is None:
+            # Незарегистрированные запросы группируем по типу операции
+            name = query.split(None, 1)[0].upper() if query.strip() else "unknown"
+            self.query_names[query] = name
+        return name
+
+    def _setup_metrics(self, meter) -> None:
+        self.checkout_duration = meter.create_histogram(
+            "db.client.connection.wait_time",
+            unit="s",
+            description="Время ожидания соединения из пула",
+        )
+        self.query_duration = meter.create_histogram(
+            "db.client.operation.duration",
+            unit="s",
+            description="Время выполнения запроса",
+        )
+        self.connections_created = meter.create_counter(
+            "db.client.connection.created",
+            description="Количество новых соединений с БД",
+        )
+        self.connections_recycled = meter.create_counter(
+            "db.client.connection.recycled",
+            description="Количество переоткрытых соединений (recycle, invalidate)",
+        )
+        meter.create_observable_gauge(
+            "db.client.connection.count",
+            callbacks=[self._observe_connections],
+            description="Количество соединений пула по состоянию",
+        )
+        meter.create_observable_gauge(
+            "db.client.connection.overflow",
+            callbacks=[self._observe_overflow],
+            description="Количество соединений сверх pool_size",
+        )
+
+        event.listen(self.engine.sync_engine.pool, "connect", self._on_connect)
+
+    def _on_connect(self, dbapi_connection, connection_record) -> None:
+        # record_info живет все время жизни записи пула, в отличие от соединения внутри нее
+        if connection_record.record_info.get("connected"):
+            self.connections_recycled.add(1)
+        else:
+            connection_record.record_info["connected"] = True
+        self.connections_created.add(1)
+
+    def _observe_connections(self, options: CallbackOptions):
+        pool = self.engine.sync_engine.pool
+        yield Observation(pool.checkedout(), {"state": "used"})
+        yield Observation(pool.checkedin(), {"state": "idle"})
+
+    def _observe_overflow(self, options: CallbackOptions):
+        yield Observation(max(self.engine.sync_engine.pool.overflow(), 0))
@@ -0,0 +1,124 @@
+import math
+import time
+from dataclasses import dataclass
+
+from internal import common, interface
+
+# GCRA сразу по нескольким ключам: состояние обновляется только если разрешены все ключи.
+# ARGV для каждого ключа: интервал между запросами и допустимый всплеск в миллисекундах.
+# Возвращает {0, 0} либо {время до повтора в мс, индекс ключа, упершегося в лимит}.
+GCRA_SCRIPT = """
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+
+local new_tats = {}
+local retry_after = 0
+local limited_index = 0
+
+for i, key in ipairs(KEYS) do
+    local interval = tonumber(ARGV[i * 2 - 1])
+    local burst_offset = tonumber(ARGV[i * 2])
+
+    local tat = tonumber(redis.call('GET', key)) or now
+    if tat < now then
+        tat = now
+    end
+
+    local new_tat = tat + interval
+    local wait = new_tat - burst_offset - now
+    if wait > retry_after then
+        retry_after = wait
+        limited_index = i
+    end
+    new_tats[i] = new_tat
+end
+
+if retry_after > 0 then
+    return {math.ceil(retry_after), limited_index}
+end
+
+for i, key in ipairs(KEYS) do
+    redis.call('SET', key, new_tats[i], 'PX', math.ceil(new_tats[i] - now))
+end
+return {0, 0}
+"""
+
+
+@dataclass
+class RateLimit:
+    per_minute: float
+    burst: int
+
+    def __post_init__(self):
+        # При burst=0 GCRA отклоняет каждый запрос, а не отключает лимит
+        if self.per_minute <= 0 or self.burst < 1:
+            raise ValueError(f"invalid rate limit: per_minute={self.per_minute}, burst={self.burst}")
+
+
+class RateLimiter(interface.IRateLimiter):
+    def __init__(
+        self,
+        tel: interface.ITelemetry,
+        redis_client: interface.IRedis,
+        limits: dict[str, RateLimit],
+        local_cache_size: int = 10000,
+    ):
+        self.logger = tel.logger()
+        self.redis_client = redis_client
+        self.limits = limits
+        self.local_cache_size = local_cache_size
+
+        # Локальный префильтр: ключ -> момент (time.monotonic), до которого ключ заблокирован
+        self._blocked_until: dict[str, float] = {}
+
+        meter = tel.meter()
+        self.allowed = meter.create_counter(
+            "rate_limiter.allowed",
+            description="Количество запросов, прошедших лимит",
+        )
+        self.blocked = meter.create_counter(
+            "rate_limiter.blocked",
+            description="Количество запросов, отклоненных лимитом",
+        )
+
+    async def check(self, route: str, subjects: dict[str, str]) -> None:
+        keys = [f"rate_limit:{route}:{name}:{subject}" for name, subject in subjects.items()]
+        names = list(subjects.keys())
+
+        now = time.monotonic()
+        for name, key in zip(names, keys, strict=True):
+            blocked_until = self._blocked_until.get(key)
+            if blocked_until is None:
+                continue
+            if blocked_until > now:
+                self.blocked.add(1, {"route": route, "limit": name, "source": "local"})
+                raise common.ErrTooManyRequests(math.ceil(blocked_until - now))
+            del self._blocked_until[key]
+
+        args = []
+        for name in names:
+            limit = self.limits[name]
+            interval = 60000 / limit.per_minute
+            args.extend([interval, interval * limit.burst])
+
+        try:
+            retry_after_ms, limited_index = await self.redis_client.run_script(GCRA_SCRIPT, keys, args)
+        except Exception as err:
+            # Redis недоступен - пропускаем запрос, CPU защищает admission controller
+            self.logger.warning("Лимитер запросов недоступен", {common.ERROR_KEY: str(err)})
+            return
+
+        if retry_after_ms > 0:
+            name = names[limited_index - 1]
+            retry_after = retry_after_ms / 1000
+            self._block_locally(keys[limited_index - 1], now + retry_after)
+            self.blocked.add(1, {"route": route, "limit": name, "source": "redis"})
+            raise common.ErrTooManyRequests(math.ceil(retry_after))
+
+        self.allowed.add(1, {"route": route})
+
+    def _block_locally(self, key: str, blocked_until: float) -> None:
+        if len(self._blocked_until) >= self.local_cache_size:
+            # Вытесняем самую старую запись, dict сохраняет порядок вставки
+            del self._blocked_until[next(iter(self._blocked_until))]
+        self._blocked_until[key] = blocked_until
@@ -37,6 +37,9 @@ class RedisClient(interface.IRedis):
 
         self.async_pool = None
         self.async_client = None
+        self.bytes_async_pool = None
+        self.bytes_async_client = None
+        self.scripts = {}
 
     async def set(self, key: str, value: Any, ttl: int = None) -> bool:
         try:
@@ -58,16 +61,61 @@ class RedisClient(interface.IRedis):
         except Exception:
             return default
 
+    async def set_nx(self, key: str, value: Any, ttl: int) -> bool:
+        # Один SET NX EX: True только у того, кто записал ключ первым
+        client = await self.get_async_client()
+        return bool(await client.set(key, self._serialize_value(value), ex=ttl, nx=True))
+
+    async def set_bytes(self, key: str, value: bytes, ttl: int = None) -> bool:
+        client = await self.get_bytes_async_client()
+        if ttl:
+            return await client.setex(key, ttl, value)
+        return await client.set(key, value)
+
+    async def get_bytes(self, key: str) -> bytes | None:
+        client = await self.get_bytes_async_client()
+        return await client.get(key)
+
+    async def delete(self, *keys: str) -> int:
+        client = await self.get_async_client()
+        return await client.delete(*keys)
+
+    async def run_script(self, script: str, keys: list[str], args: list[Any]) -> Any:
+        client = await self.get_async_client()
+        registered_script = self.scripts.get(script)
+        if registered_script is None:
+            # Script сам переключается с EVALSHA на EVAL, если скрипт еще не загружен в Redis
+            registered_script = client.register_script(script)
+            self.scripts[script] = registered_script
+        return await registered_script(keys=keys, args=args)
+
+    async def warmup(self, connections: int) -> None:
+        # Одновременные PING занимают разные соединения пула, после ответа они остаются открытыми
+        client = await self.get_async_client()
+        bytes_client = await self.get_bytes_async_client()
+        await asyncio.gather(*[client.ping() for _ in range(connections)])
+        await asyncio.gather(*[bytes_client.ping() for _ in range(connections)])
+
     async def get_async_client(self) -> aioredis.Redis:
         if self.async_client is None:
-            self.async_pool = aioredis.ConnectionPool.from_url(
-                f"redis://:{self.pool.connection_kwargs.get('password')}@{self.pool.connection_kwargs['host']}:{self.pool.connection_kwargs['port']}/{self.pool.connection_kwargs['db']}",
-                max_connections=self.pool.max_connections,
-                decode_responses=True,
-            )
+            self.async_pool = self._create_async_pool(decode_responses=True)
             self.async_client = aioredis.Redis(connection_pool=self.async_pool)
         return self.async_client
 
+    async def get_bytes_async_client(self) -> aioredis.Redis:
+        # Бинарные значения нельзя декодировать в str, поэтому для них отдельный пул
+        if self.bytes_async_client is None:
+            self.bytes_async_pool = self._create_async_pool(decode_responses=False)
+            self.bytes_async_client = aioredis.Redis(connection_pool=self.bytes_async_pool)
+        return self.bytes_async_client
+
+    def _create_async_pool(self, decode_responses: bool) -> aioredis.ConnectionPool:
+        return aioredis.ConnectionPool.from_url(
+            f"redis://:{self.pool.connection_kwargs.get('password')}@{self.pool.connection_kwargs['host']}:{self.pool.connection_kwargs['port']}/{self.pool.connection_kwargs['db']}",
+            max_connections=self.pool.max_connections,
+            decode_responses=decode_responses,
+        )
+
     def _serialize_value(self, value: Any) -> str:
         if isinstance(value, str):
             return value
@@ -81,12 +129,25 @@ class RedisClient(interface.IRedis):
         except (json.JSONDecodeError, TypeError):
             return value
 
+    async def aclose(self) -> None:
+        for client in (self.async_client, self.bytes_async_client):
+            if client:
+                await client.aclose()
+        for pool in (self.async_pool, self.bytes_async_pool):
+            if pool:
+                await pool.aclose()
+        self.pool.disconnect()
+
     def close(self):
         try:
             if self.async_client:
                 asyncio.create_task(self.async_client.aclose())
             if self.async_pool:
                 asyncio.create_task(self.async_pool.aclose())
+            if self.bytes_async_client:
+                asyncio.create_task(self.bytes_async_client.aclose())
+            if self.bytes_async_pool:
+                asyncio.create_task(self.bytes_async_pool.aclose())
             self.pool.disconnect()
         except Exception:
             pass
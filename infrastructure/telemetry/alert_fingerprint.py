@@ -0,0 +1,41 @@
+import hashlib
+import re
+from dataclasses import dataclass
+
+_FRAME_RE = re.compile(r'^\s*File "(?P<path>[^"]+)", line \d+, in (?P<function>\S+)', re.MULTILINE)
+# Идентификаторы, адреса и строковые значения в сообщении различаются от запроса к запросу
+_VOLATILE_RE = re.compile(r"0x[0-9a-fA-F]+|\d+|'[^']*'|\"[^\"]*\"")
+
+
+@dataclass(frozen=True, slots=True)
+class Fingerprint:
+    key: str
+    exception_type: str
+
+
+def fingerprint(traceback: str, message: str = "") -> Fingerprint:
+    """Группирует ошибки по типу исключения и цепочке вызовов, номера строк и значения в сообщении не учитываются."""
+    frames = [f"{_short_path(match['path'])}:{match['function']}" for match in _FRAME_RE.finditer(traceback)]
+    exception_type = _exception_type(traceback)
+
+    if frames:
+        signature = "|".join([exception_type, *frames])
+    else:
+        # Без traceback остается только нормализованный текст ошибки
+        signature = "|".join([exception_type, _VOLATILE_RE.sub("#", message)])
+
+    key = hashlib.sha1(signature.encode("utf-8"), usedforsecurity=False).hexdigest()[:16]
+    return Fingerprint(key, exception_type)
+
+
+def _exception_type(traceback: str) -> str:
+    # Последняя строка без отступа - "module.ExceptionType: сообщение"
+    for line in reversed(traceback.strip().splitlines()):
+        if line and not line[0].isspace():
+            return line.split(":", 1)[0].strip()
+    return ""
+
+
+def _short_path(path: str) -> str:
+    # Два последних компонента пути: не зависят от каталога установки и различают одноименные модули
+    return "/".join(path.replace("\\", "/").rsplit("/", 2)[-2:])
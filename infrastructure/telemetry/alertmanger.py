@@ -1,16 +1,38 @@
 import asyncio
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
 from datetime import datetime
 
 import httpx
 import openai
 from aiogram import Bot
 from aiogram.enums import ParseMode
+from aiogram.exceptions import TelegramRetryAfter
 from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+from opentelemetry import metrics
 
 from infrastructure.redis_client.redis_client import RedisClient
+from internal import interface
 
+from .alert_fingerprint import Fingerprint, fingerprint
 
-class AlertManager:
+# Сколько TraceID повторов показывать в дайджесте
+_DIGEST_TRACE_IDS = 5
+
+
+@dataclass(slots=True)
+class _Digest:
+    fingerprint: Fingerprint
+    trace_id: str
+    span_id: str
+    traceback: str
+    # Повторы после первого, уже отправленного алерта; 0 - сам первый алерт
+    repeats: int = 0
+    trace_ids: list[str] = field(default_factory=list)
+
+
+class AlertManager(interface.IAlertManager):
     def __init__(
         self,
         tg_bot_token: str,
@@ -23,6 +45,15 @@ class AlertManager:
         monitoring_redis_db: int,
         monitoring_redis_password: str,
         openai_api_key: str = None,
+        dedup_ttl: int = 30,
+        queue_size: int = 100,
+        workers: int = 2,
+        local_dedup_size: int = 10000,
+        digest_window: float = 60,
+        max_digests: int = 100,
+        analysis_cache_ttl: int = 86400,
+        tg_rate_per_minute: float = 20,
+        tg_burst: int = 3,
     ):
         self.bot = Bot(tg_bot_token)
         self.alert_tg_chat_id = alert_tg_chat_id
@@ -40,17 +71,165 @@ class AlertManager:
         else:
             self.openai_client = None
 
-    def send_error_alert(self, trace_id: str, span_id: str, traceback: str):
+        self.dedup_ttl = dedup_ttl
+        self.workers = workers
+        self.local_dedup_size = local_dedup_size
+        self.digest_window = digest_window
+        self.max_digests = max_digests
+        self.analysis_cache_ttl = analysis_cache_ttl
+
+        # trace_id -> момент, до которого повторные алерты отбрасываются без обращения в Redis
+        self._recent: OrderedDict[str, float] = OrderedDict()
+        # trace_id, span_id, traceback, сообщение
+        self._queue: asyncio.Queue[tuple[str, str, str, str]] = asyncio.Queue(maxsize=queue_size)
+        self._worker_tasks: list[asyncio.Task] = []
+        # fingerprint -> повторы ошибки, накопленные с момента отправки первого алерта
+        self._digests: dict[str, _Digest] = {}
+        self._flush_tasks: set[asyncio.Task] = set()
+        # При остановке окна дайджестов закрываются досрочно, чтобы повторы не потерялись
+        self._closing = asyncio.Event()
+        # При остановке лимит Telegram не соблюдаем: ожидание токенов не уложилось бы в max_wait
+        self._draining = asyncio.Event()
+        # Telegram ограничивает частоту сообщений в один чат
+        self._tg_bucket = _TokenBucket(tg_rate_per_minute / 60, tg_burst)
+
+        # Создается раньше телеметрии, поэтому через глобальный meter, он подхватит провайдер позже
+        meter = metrics.get_meter("alert_manager")
+        self.deduplicated = meter.create_counter(
+            "alert_manager.deduplicated",
+            description="Количество алертов, отброшенных как повторные",
+        )
+        self.dropped = meter.create_counter(
+            "alert_manager.dropped",
+            description="Количество алертов, отброшенных из-за переполнения очереди",
+        )
+        self.grouped = meter.create_counter(
+            "alert_manager.grouped",
+            description="Количество алертов, объединенных в дайджест по fingerprint",
+        )
+        self.ungrouped = meter.create_counter(
+            "alert_manager.ungrouped",
+            description="Количество алертов, отправленных без дайджеста из-за лимита max_digests",
+        )
+
+    def send_error_alert(self, trace_id: str, span_id: str, traceback: str, message: str = ""):
+        if self._seen_recently(trace_id):
+            self.deduplicated.add(1, {"scope": "local"})
+            return
+
+        self._start_workers()
+        try:
+            self._queue.put_nowait((trace_id, span_id, traceback, message))
+        except asyncio.QueueFull:
+            # При шторме ошибок лишние алерты отбрасываются, а не копятся задачами в event loop.
+            # trace не запоминаем: следующая ошибка в нем сможет попасть в очередь
+            self.dropped.add(1, {"reason": "queue_full"})
+            return
+        self._remember(trace_id)
+
+    async def close(self, max_wait: float) -> None:
+        self._draining.set()
+        # Даем воркерам отправить уже принятые алерты, то, что не успели за max_wait, теряется
+        if self._worker_tasks:
+            try:
+                await asyncio.wait_for(self._queue.join(), max_wait)
+            except TimeoutError:
+                print(f"Не отправлено алертов при остановке: {self._queue.qsize()}", flush=True)
+            for task in self._worker_tasks:
+                task.cancel()
+            await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+            self._worker_tasks = []
+
+        self._closing.set()
+        if self._flush_tasks:
+            _, pending = await asyncio.wait(set(self._flush_tasks), timeout=max_wait)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+        await self.bot.session.close()
+        await self.redis_client.aclose()
+
+    def _seen_recently(self, trace_id: str) -> bool:
+        now = time.monotonic()
+        # TTL у всех записей одинаковый, поэтому самые старые всегда в начале
+        while self._recent and next(iter(self._recent.values())) <= now:
+            self._recent.popitem(last=False)
+        return trace_id in self._recent
+
+    def _remember(self, trace_id: str) -> None:
+        self._recent[trace_id] = time.monotonic() + self.dedup_ttl
+        if len(self._recent) > self.local_dedup_size:
+            self._recent.popitem(last=False)
+
+    def _start_workers(self) -> None:
+        if self._worker_tasks:
+            return
         loop = asyncio.get_running_loop()
-        loop.create_task(self.__send_error_alert(trace_id, span_id, traceback))
+        self._worker_tasks = [loop.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def _worker(self):
+        while True:
+            trace_id, span_id, traceback, message = await self._queue.get()
+            try:
+                await self.__send_error_alert(trace_id, span_id, traceback, message)
+            except Exception as e:
+                print(f"Ошибка при отправке алерта: {e}", flush=True)
+            finally:
+                self._queue.task_done()
+
+    async def __send_error_alert(self, trace_id: str, span_id: str, traceback: str, message: str):
+        try:
+            # Другие процессы сервиса могли уже отправить алерт по этому trace
+            is_first = await self.redis_client.set_nx(trace_id, "1", ttl=self.dedup_ttl)
+        except Exception as e:
+            # Без Redis остается локальная дедупликация, алерт важнее возможного дубля
+            print(f"Ошибка при дедупликации алерта в Redis: {e}", flush=True)
+            is_first = True
+        if not is_first:
+            self.deduplicated.add(1, {"scope": "redis"})
+            return
 
-    async def __send_error_alert(self, trace_id: str, span_id: str, traceback: str):
-        alert_send = await self.redis_client.get(trace_id)
-        if alert_send:
+        error_fingerprint = fingerprint(traceback, message)
+        digest = self._digests.get(error_fingerprint.key)
+        if digest is not None:
+            # Первый алерт по этой ошибке уже отправлен, повторы уйдут одним дайджестом по окончании окна
+            self.grouped.add(1)
+            if digest.repeats == 0:
+                digest.trace_id, digest.span_id, digest.traceback = trace_id, span_id, traceback
+            digest.repeats += 1
+            if len(digest.trace_ids) < _DIGEST_TRACE_IDS:
+                digest.trace_ids.append(trace_id)
             return
 
-        await self.redis_client.set(trace_id, "1", ttl=30)
-        await self.__send_error_alert_to_tg(trace_id, span_id, traceback)
+        if len(self._digests) >= self.max_digests:
+            # Для новых ошибок места под дайджест нет: отправляем без группировки, лимит Telegram все равно действует
+            self.ungrouped.add(1)
+            await self.__send_error_alert_to_tg(
+                _Digest(error_fingerprint, trace_id, span_id, traceback, trace_ids=[trace_id])
+            )
+            return
+        self._digests[error_fingerprint.key] = _Digest(error_fingerprint, trace_id, span_id, traceback)
+        task = asyncio.create_task(self._flush_digest(error_fingerprint.key))
+        self._flush_tasks.add(task)
+        task.add_done_callback(self._flush_tasks.discard)
+
+        await self.__send_error_alert_to_tg(
+            _Digest(error_fingerprint, trace_id, span_id, traceback, trace_ids=[trace_id])
+        )
+
+    async def _flush_digest(self, key: str):
+        try:
+            await asyncio.wait_for(self._closing.wait(), self.digest_window)
+        except TimeoutError:
+            pass
+        digest = self._digests.pop(key)
+        if digest.repeats == 0:
+            return
+        try:
+            await self.__send_error_alert_to_tg(digest)
+        except Exception as e:
+            print(f"Ошибка при отправке дайджеста алертов: {e}", flush=True)
 
     def _format_telegram_text(self, text: str) -> str:
         # Экранируем специальные символы HTML
@@ -70,7 +249,8 @@ class AlertManager:
 
         return text
 
-    async def __send_error_alert_to_tg(self, trace_id: str, span_id: str, traceback: str):
+    async def __send_error_alert_to_tg(self, digest: _Digest):
+        trace_id, span_id = digest.trace_id, digest.span_id
         log_link = f"{self.grafana_url}/explore?schemaVersion=1&panes=%7B%220pz%22:%7B%22datasource%22:%22loki%22,%22queries%22:%5B%7B%22refId%22:%22A%22,%22expr%22:%22%7Bservice_name%3D~%5C%22.%2B%5C%22%7D%20%7C%20trace_id%3D%60{trace_id}%60%20%7C%3D%20%60%60%22,%22queryType%22:%22range%22,%22datasource%22:%7B%22type%22:%22loki%22,%22uid%22:%22loki%22%7D,%22editorMode%22:%22code%22,%22direction%22:%22backward%22%7D%5D,%22range%22:%7B%22from%22:%22now-2d%22,%22to%22:%22now%22%7D%7D%7D&orgId=1"
         trace_link = f"{self.grafana_url}/explore?schemaVersion=1&panes=%7B%220pz%22:%7B%22datasource%22:%22tempo%22,%22queries%22:%5B%7B%22refId%22:%22A%22,%22datasource%22:%7B%22type%22:%22tempo%22,%22uid%22:%22tempo%22%7D,%22queryType%22:%22traceql%22,%22limit%22:20,%22tableType%22:%22traces%22,%22metricsQueryType%22:%22range%22,%22query%22:%22{trace_id}%22%7D%5D,%22range%22:%7B%22from%22:%22now-2d%22,%22to%22:%22now%22%7D%7D%7D&orgId=1"
 
@@ -78,17 +258,27 @@ class AlertManager:
         current_time = datetime.now().strftime("%H:%M:%S")
 
         # Основная информация об ошибке
-        text = f"""🚨 <b>Ошибка в сервисе</b>
+        if digest.repeats > 0:
+            title = f"🔁 <b>Повторы ошибки после первого алерта: {digest.repeats}</b>"
+        else:
+            title = "🚨 <b>Ошибка в сервисе</b>"
+        text = f"""{title}
 
 <b>Сервис:</b> <code>{self.service_name}</code>
 <b>Время:</b> <code>{current_time}</code>
+<b>Тип:</b> <code>{digest.fingerprint.exception_type or "-"}</code>
+<b>Fingerprint:</b> <code>{digest.fingerprint.key}</code>
 <b>TraceID:</b> <code>{trace_id}</code>
 <b>SpanID:</b> <code>{span_id}</code>"""
 
+        other_trace_ids = [other for other in digest.trace_ids if other != trace_id]
+        if other_trace_ids:
+            text += "\n<b>Другие TraceID:</b>\n" + "\n".join(f"<code>{other}</code>" for other in other_trace_ids)
+
         # Добавляем анализ LLM если доступен
         if self.openai_client is not None:
             try:
-                llm_analysis = await self.generate_analysis(traceback)
+                llm_analysis = await self._cached_analysis(digest.fingerprint, digest.traceback)
                 if llm_analysis:
                     text += f"\n\n{llm_analysis}"
             except Exception as e:
@@ -108,18 +298,32 @@ class AlertManager:
             ]
         )
 
+        await self._wait_tg_rate_limit()
         try:
-            await self.bot.send_message(
-                self.alert_tg_chat_id,
-                text,
-                message_thread_id=self.alert_tg_chat_thread_id,
-                reply_markup=keyboard,
-                parse_mode=ParseMode.HTML,
-            )
+            try:
+                await self.bot.send_message(
+                    self.alert_tg_chat_id,
+                    text,
+                    message_thread_id=self.alert_tg_chat_thread_id,
+                    reply_markup=keyboard,
+                    parse_mode=ParseMode.HTML,
+                )
+            except TelegramRetryAfter as e:
+                # Лимит все же превышен (например, другими процессами), ждем сколько просит Telegram
+                await asyncio.sleep(e.retry_after)
+                await self._wait_tg_rate_limit()
+                await self.bot.send_message(
+                    self.alert_tg_chat_id,
+                    text,
+                    message_thread_id=self.alert_tg_chat_thread_id,
+                    reply_markup=keyboard,
+                    parse_mode=ParseMode.HTML,
+                )
         except Exception as e:
             print(f"Ошибка при отправке сообщения в Telegram: {e}", flush=True)
 
             simple_text = f"🚨 Ошибка в сервисе {self.service_name}\nTraceID: {trace_id}"
+            await self._wait_tg_rate_limit()
             await self.bot.send_message(
                 self.alert_tg_chat_id,
                 simple_text,
@@ -127,6 +331,32 @@ class AlertManager:
                 reply_markup=keyboard,
             )
 
+    async def _wait_tg_rate_limit(self) -> None:
+        if self._draining.is_set():
+            return
+        # Уже ждущие токена отправки тоже прерываются остановкой
+        acquire = asyncio.ensure_future(self._tg_bucket.acquire())
+        draining = asyncio.ensure_future(self._draining.wait())
+        _, pending = await asyncio.wait({acquire, draining}, return_when=asyncio.FIRST_COMPLETED)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    async def _cached_analysis(self, error_fingerprint: Fingerprint, traceback: str) -> str:
+        # Одна и та же ошибка разбирается LLM один раз, а не на каждый алерт
+        cache_key = f"alert:analysis:v1:{error_fingerprint.key}"
+        cached = await self.redis_client.get(cache_key)
+        if cached:
+            return cached
+
+        analysis = await self.generate_analysis(traceback)
+        if analysis:
+            try:
+                await self.redis_client.set(cache_key, analysis, ttl=self.analysis_cache_ttl)
+            except Exception as e:
+                print(f"Ошибка при сохранении анализа LLM: {e}", flush=True)
+        return analysis
+
     async def generate_analysis(self, traceback: str) -> str:
         try:
             system_prompt = """Ты опытный Python-разработчик и специалист по мониторингу.
@@ -179,3 +409,24 @@ class AlertManager:
         except Exception as err:
             print(f"Ошибка при генерации анализа: {err}", flush=True)
             return ""
+
+
+class _TokenBucket:
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        # Под блокировкой ожидающие получают токены по очереди
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+                self._updated_at = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
@@ -1,8 +1,10 @@
-import inspect
 import logging
+import logging.handlers
+import queue
+import sys
 from contextvars import ContextVar
 
-from opentelemetry import trace
+from opentelemetry import context, metrics, trace
 from opentelemetry.sdk._logs import LoggerProvider, LoggingHandler
 
 from internal import common, interface
@@ -17,19 +19,46 @@ class OtelLogger(interface.IOtelLogger):
         logger_provider: LoggerProvider,
         service_name: str,
         log_context: ContextVar[dict],
+        log_level: str = "DEBUG",
+        meter: metrics.Meter | None = None,
+        queue_size: int = 0,
+        queue_overflow: str = "drop",
     ):
         self.handler = LoggingHandler(level=logging.DEBUG, logger_provider=logger_provider)
         self.service_name = service_name
         self.log_context = log_context
 
         self.logger = logging.getLogger("main")
-        self.logger.setLevel(logging.DEBUG)
-        self.logger.addHandler(self.handler)
+        self.logger.setLevel(log_level.upper())
         self.logger.propagate = False
 
+        self.listener: _ContextQueueListener | None = None
+        if queue_size > 0:
+            # Преобразование записи и экспорт уходят в фоновый поток, запрос только кладет запись в очередь
+            records = queue.Queue(maxsize=queue_size)
+            dropped = None
+            if meter is not None:
+                dropped = meter.create_counter(
+                    "logger.dropped_records",
+                    description="Количество записей лога, отброшенных из-за переполнения очереди",
+                )
+            self.logger.addHandler(_BoundedQueueHandler(records, queue_overflow == "block", dropped))
+            self.listener = _ContextQueueListener(records, self.handler)
+            self.listener.start()
+        else:
+            self.logger.addHandler(self.handler)
+
         self.alert_manger = alert_manger
 
+        # (код вызывающей функции, строка) -> "файл:строка"
+        self._call_sites: dict[tuple, str] = {}
+
     def log(self, level: str, message: str, fields: dict = None) -> None:
+        # Отфильтрованные уровнем записи не должны стоить ничего, кроме этой проверки
+        log_level = _LEVELS.get(level, logging.INFO)
+        if not self.logger.isEnabledFor(log_level):
+            return
+
         file_info = self._get_caller_info(3)
         attributes: dict = {common.FILE_KEY: file_info}
 
@@ -55,11 +84,18 @@ class OtelLogger(interface.IOtelLogger):
 
             if level == "ERROR":
                 if self.alert_manger is not None:
-                    self.alert_manger.send_error_alert(trace_id, span_id, attributes.get(common.TRACEBACK_KEY, ""))
+                    self.alert_manger.send_error_alert(
+                        trace_id, span_id, attributes.get(common.TRACEBACK_KEY, ""), message
+                    )
 
-        log_level = getattr(logging, level.upper(), logging.INFO)
         self.logger.log(log_level, self.service_name + " | " + message, extra=attributes)
 
+    def close(self) -> None:
+        # Дожидаемся, пока фоновый поток выгрузит очередь в LoggerProvider
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+
     def _extract_extra_params(self, fields: dict) -> dict:
         extra_attrs = {}
         for key, value in fields.items():
@@ -76,22 +112,17 @@ class OtelLogger(interface.IOtelLogger):
 
     def _get_caller_info(self, skip: int) -> str:
         try:
-            frame = inspect.currentframe()
-            for _ in range(skip):
-                if frame is None:
-                    break
-                frame = frame.f_back
-
-            if frame is None:
-                return "unknown:0"
-
-            filename = frame.f_code.co_filename
-            line_number = frame.f_lineno
-
-            return f"{filename}:{line_number}"
-        except Exception:
+            frame = sys._getframe(skip)
+        except ValueError:
             return "unknown:0"
 
+        call_site = (frame.f_code, frame.f_lineno)
+        file_info = self._call_sites.get(call_site)
+        if file_info is None:
+            file_info = f"{frame.f_code.co_filename}:{frame.f_lineno}"
+            self._call_sites[call_site] = file_info
+        return file_info
+
     def debug(self, message: str, fields: dict = None) -> None:
         self.log("DEBUG", message, fields)
 
@@ -103,3 +134,52 @@ class OtelLogger(interface.IOtelLogger):
 
     def error(self, message: str, fields: dict = None) -> None:
         self.log("ERROR", message, fields)
+
+
+_LEVELS = {
+    "DEBUG": logging.DEBUG,
+    "INFO": logging.INFO,
+    "WARN": logging.WARNING,
+    "ERROR": logging.ERROR,
+}
+
+
+class _BoundedQueueHandler(logging.handlers.QueueHandler):
+    def __init__(self, records: queue.Queue, block: bool, dropped: metrics.Counter | None):
+        super().__init__(records)
+        self.block = block
+        self.dropped = dropped
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Запись никто, кроме фонового потока, не читает: копирование и форматирование stdlib тут не нужны
+        # LoggingHandler берет trace context из текущего контекста, в фоновом потоке его уже нет
+        record.otel_context = context.get_current()
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        if self.block:
+            self.queue.put(record)
+            return
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            if self.dropped is not None:
+                self.dropped.add(1, {"level": record.levelname})
+
+
+class _ContextQueueListener(logging.handlers.QueueListener):
+    def enqueue_sentinel(self) -> None:
+        # Очередь может быть заполнена, фоновый поток ее освободит
+        self.queue.put(self._sentinel)
+
+    def handle(self, record: logging.LogRecord) -> None:
+        otel_context = record.__dict__.pop("otel_context", None)
+        if otel_context is None:
+            super().handle(record)
+            return
+
+        token = context.attach(otel_context)
+        try:
+            super().handle(record)
+        finally:
+            context.detach(token)
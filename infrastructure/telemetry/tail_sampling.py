@@ -0,0 +1,112 @@
+import threading
+from collections import OrderedDict
+
+from opentelemetry.context import Context
+from opentelemetry.sdk.trace import ReadableSpan, Span, SpanProcessor
+from opentelemetry.sdk.trace.sampling import Decision, Sampler, SamplingResult
+from opentelemetry.semconv.trace import SpanAttributes
+from opentelemetry.trace import SpanContext, StatusCode, TraceFlags
+
+
+class RecordUnsampledSampler(Sampler):
+    """Отброшенные head-сэмплером span'ы все равно записываются локально, чтобы их мог сохранить tail-сэмплер."""
+
+    def __init__(self, delegate: Sampler):
+        self.delegate = delegate
+
+    def should_sample(
+        self, parent_context, trace_id, name, kind=None, attributes=None, links=None, trace_state=None
+    ) -> SamplingResult:
+        result = self.delegate.should_sample(parent_context, trace_id, name, kind, attributes, links, trace_state)
+        if result.decision == Decision.DROP:
+            # Флаг sampled не выставляется, поэтому нижестоящие сервисы такой trace тоже не сэмплируют
+            return SamplingResult(Decision.RECORD_ONLY, result.attributes, result.trace_state)
+        return result
+
+    def get_description(self) -> str:
+        return f"RecordUnsampled{{{self.delegate.get_description()}}}"
+
+
+class TailSamplingSpanProcessor(SpanProcessor):
+    """Сохраняет несэмплированные trace'ы, если в них есть ошибка или корневой span медленнее порога."""
+
+    def __init__(
+        self,
+        delegate: SpanProcessor,
+        latency_threshold: float,
+        max_traces: int = 10000,
+    ):
+        self.delegate = delegate
+        self.latency_threshold_ns = int(latency_threshold * 1e9)
+        self.max_traces = max_traces
+
+        # trace_id -> законченные span'ы trace'а, ожидающие завершения локального корня
+        self._traces: OrderedDict[int, list[ReadableSpan]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def on_start(self, span: Span, parent_context: Context | None = None) -> None:
+        self.delegate.on_start(span, parent_context)
+
+    def on_end(self, span: ReadableSpan) -> None:
+        if span.context.trace_flags.sampled:
+            # Trace уже выбран head-сэмплером
+            self.delegate.on_end(span)
+            return
+
+        trace_id = span.context.trace_id
+        with self._lock:
+            spans = self._traces.get(trace_id)
+            if spans is None:
+                spans = self._traces[trace_id] = []
+                if len(self._traces) > self.max_traces:
+                    # Корень самого старого trace'а так и не завершился, отбрасываем его
+                    self._traces.popitem(last=False)
+            spans.append(span)
+
+            if span.parent is not None and not span.parent.is_remote:
+                return
+            del self._traces[trace_id]
+
+        if self._should_keep(span, spans):
+            for kept_span in spans:
+                self.delegate.on_end(_as_sampled(kept_span))
+
+    def shutdown(self) -> None:
+        self.delegate.shutdown()
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        return self.delegate.force_flush(timeout_millis)
+
+    def _should_keep(self, root: ReadableSpan, spans: list[ReadableSpan]) -> bool:
+        if root.end_time - root.start_time >= self.latency_threshold_ns:
+            return True
+        status_code = (root.attributes or {}).get(SpanAttributes.HTTP_STATUS_CODE, 0)
+        # 503 отдается при сбросе нагрузки, сохранять каждый такой trace во время перегрузки незачем
+        if status_code >= 500 and status_code != 503:
+            return True
+        return any(span.status.status_code == StatusCode.ERROR for span in spans)
+
+
+def _as_sampled(span: ReadableSpan) -> ReadableSpan:
+    # Экспортирующие процессоры пропускают span'ы без флага sampled
+    context = SpanContext(
+        span.context.trace_id,
+        span.context.span_id,
+        span.context.is_remote,
+        TraceFlags(TraceFlags.SAMPLED),
+        span.context.trace_state,
+    )
+    return ReadableSpan(
+        name=span.name,
+        context=context,
+        parent=span.parent,
+        resource=span.resource,
+        attributes=span.attributes,
+        events=span.events,
+        links=span.links,
+        kind=span.kind,
+        status=span.status,
+        start_time=span.start_time,
+        end_time=span.end_time,
+        instrumentation_scope=span.instrumentation_scope,
+    )
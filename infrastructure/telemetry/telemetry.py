@@ -14,7 +14,7 @@ from opentelemetry.sdk.metrics.export import PeriodicExportingMetricReader
 from opentelemetry.sdk.resources import Resource
 from opentelemetry.sdk.trace import SpanLimits, TracerProvider
 from opentelemetry.sdk.trace.export import BatchSpanProcessor
-from opentelemetry.sdk.trace.sampling import ALWAYS_ON
+from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
 from opentelemetry.semconv.resource import ResourceAttributes
 from opentelemetry.trace.propagation.tracecontext import TraceContextTextMapPropagator
 
@@ -22,6 +22,7 @@ from internal import interface
 
 from .alertmanger import AlertManager
 from .logger import OtelLogger
+from .tail_sampling import RecordUnsampledSampler, TailSamplingSpanProcessor
 
 
 class Telemetry(interface.ITelemetry):
@@ -36,6 +37,11 @@ class Telemetry(interface.ITelemetry):
         otlp_port: int,
         log_context: ContextVar[dict],
         alert_manager: AlertManager = None,
+        trace_sample_ratio: float = 1.0,
+        tail_sampling: bool = False,
+        tail_sampling_latency_threshold: float = 1.0,
+        log_queue_size: int = 0,
+        log_queue_overflow: str = "drop",
     ):
         self.log_level = log_level
         self.environment = environment
@@ -45,6 +51,11 @@ class Telemetry(interface.ITelemetry):
         self.service_version = service_version
         self.otlp_endpoint = f"{otlp_host}:{otlp_port}"
         self.alert_manager = alert_manager
+        self.trace_sample_ratio = trace_sample_ratio
+        self.tail_sampling = tail_sampling
+        self.tail_sampling_latency_threshold = tail_sampling_latency_threshold
+        self.log_queue_size = log_queue_size
+        self.log_queue_overflow = log_queue_overflow
 
         self._setup_telemetry()
 
@@ -70,13 +81,14 @@ class Telemetry(interface.ITelemetry):
     def _setup_tracing(self, resource: Resource) -> None:
         otlp_exporter = OTLPSpanExporter(endpoint=f"http://{self.otlp_endpoint}", insecure=True)
 
-        if self.environment == "prod":
-            sampler = ALWAYS_ON
-        else:
-            sampler = ALWAYS_ON
+        # Решение корневого span'а наследуется дочерними, в том числе пришедшее из заголовков запроса
+        sampler = ParentBased(TraceIdRatioBased(self.trace_sample_ratio))
+        if self.tail_sampling:
+            sampler = RecordUnsampledSampler(sampler)
 
+        # Ограничение длины страхует от огромных атрибутов, которые раздувают экспорт
         span_limits = SpanLimits(
-            max_span_attributes=256, max_attributes=256, max_events=128, max_links=128, max_attribute_length=None
+            max_span_attributes=256, max_attributes=256, max_events=128, max_links=128, max_attribute_length=1024
         )
 
         self._tracer_provider = TracerProvider(
@@ -88,6 +100,8 @@ class Telemetry(interface.ITelemetry):
         span_processor = BatchSpanProcessor(
             otlp_exporter, max_export_batch_size=512, max_queue_size=2048, export_timeout_millis=5000
         )
+        if self.tail_sampling:
+            span_processor = TailSamplingSpanProcessor(span_processor, self.tail_sampling_latency_threshold)
         self._tracer_provider.add_span_processor(span_processor)
         trace.set_tracer_provider(self._tracer_provider)
 
@@ -126,7 +140,16 @@ class Telemetry(interface.ITelemetry):
         )
 
     def _setup_logger(self) -> None:
-        self._logger = OtelLogger(self.alert_manager, self._logger_provider, self.service_name, self.log_context)
+        self._logger = OtelLogger(
+            self.alert_manager,
+            self._logger_provider,
+            self.service_name,
+            self.log_context,
+            self.log_level,
+            meter=self._meter,
+            queue_size=self.log_queue_size,
+            queue_overflow=self.log_queue_overflow,
+        )
 
     def logger(self) -> interface.IOtelLogger:
         return self._logger
@@ -140,6 +163,13 @@ class Telemetry(interface.ITelemetry):
     def shutdown(self) -> None:
         errors = []
 
+        try:
+            # Записи из очереди должны попасть в LoggerProvider до его остановки
+            if hasattr(self, "_logger"):
+                self._logger.close()
+        except Exception as err:
+            errors.append(f"logger queue shutdown: {err}")
+
         try:
             if hasattr(self, "_tracer_provider"):
                 self._tracer_provider.shutdown()
@@ -1,14 +1,19 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from starlette.responses import StreamingResponse
 
-from internal import interface, model
+from internal import common, interface, model
 from internal.controller.http.handler.account.model import *
 
+from .lifespan import Lifespan
+
 
 def NewHTTP(
+        tel: interface.ITelemetry,
         db: interface.IDB,
         account_controller: interface.IAccountController,
         http_middleware: interface.IHttpMiddleware,
+        lifespan: Lifespan,
         prefix: str,
         environment: str,
 ):
@@ -16,9 +21,11 @@ def NewHTTP(
         openapi_url=prefix + "/openapi.json",
         docs_url=prefix + "/docs",
         redoc_url=prefix + "/redoc",
+        lifespan=lifespan,
     )
     include_middleware(app, http_middleware)
-    include_db_handler(app, db, prefix, environment)
+    include_exception_handlers(app, tel)
+    include_db_handler(app, db, lifespan, prefix, environment)
 
     include_account_handlers(app, account_controller, prefix)
 
@@ -29,9 +36,31 @@ def include_middleware(
         app: FastAPI,
         http_middleware: interface.IHttpMiddleware,
 ):
-    http_middleware.authorization_middleware03(app)
-    http_middleware.logger_middleware02(app)
-    http_middleware.trace_middleware01(app)
+    # Последний добавленный middleware оказывается внешним: trace -> logger -> authorization
+    app.add_middleware(http_middleware.authorization_middleware03)
+    app.add_middleware(http_middleware.logger_middleware02)
+    app.add_middleware(http_middleware.trace_middleware01)
+
+
+def include_exception_handlers(app: FastAPI, tel: interface.ITelemetry):
+    app.add_exception_handler(common.ErrDomain, domain_error_handler(tel))
+
+
+def domain_error_handler(tel: interface.ITelemetry):
+    domain_errors = tel.meter().create_counter(
+        "http.domain_errors",
+        description="Количество ожидаемых ошибок бизнес-логики по типам",
+    )
+
+    async def handle_domain_error(request: Request, err: common.ErrDomain):
+        domain_errors.add(1, {"error": err.__class__.__name__, "status_code": err.status_code})
+        return JSONResponse(
+            status_code=err.status_code,
+            content={"error": str(err)},
+            headers=err.headers,
+        )
+
+    return handle_domain_error
 
 
 def include_account_handlers(app: FastAPI, account_controller: interface.IAccountController, prefix: str):
@@ -108,14 +137,16 @@ def include_account_handlers(app: FastAPI, account_controller: interface.IAccoun
     )
 
 
-def include_db_handler(app: FastAPI, db: interface.IDB, prefix: str, environment: str):
+def include_db_handler(app: FastAPI, db: interface.IDB, lifespan: Lifespan, prefix: str, environment: str):
     app.add_api_route(prefix + "/table/create", create_table_handler(db), methods=["GET"])
     app.add_api_route(prefix + "/table/drop", drop_table_handler(db, environment), methods=["GET"])
-    app.add_api_route(prefix + "/health", heath_check_handler(), methods=["GET"])
+    app.add_api_route(prefix + "/health", heath_check_handler(lifespan), methods=["GET"])
 
 
-def heath_check_handler():
+def heath_check_handler(lifespan: Lifespan):
     async def heath_check():
+        if not lifespan.is_ready:
+            return JSONResponse(status_code=503, content="not ready")
         return "ok"
 
     return heath_check
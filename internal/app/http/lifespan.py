@@ -0,0 +1,100 @@
+import asyncio
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING
+
+from fastapi import FastAPI
+
+from internal import common, interface
+from internal.controller.http.middlerware.authorization_cache import AuthorizationCache
+
+if TYPE_CHECKING:
+    from internal.controller.http.middlerware.jwt_verifier import JwtVerifier
+
+
+class Lifespan:
+    def __init__(
+        self,
+        tel: interface.ITelemetry,
+        db: interface.IDB,
+        redis_client: interface.IRedis,
+        loom_authorization_client: interface.ILoomAuthorizationClient,
+        account_service: interface.IAccountService,
+        password_hasher: interface.IPasswordHasher,
+        authorization_cache: AuthorizationCache,
+        jwt_verifier: "JwtVerifier | None" = None,
+        alert_manager: interface.IAlertManager | None = None,
+        warmup_connections: int = 5,
+        warmup_timeout: float = 10,
+        drain_timeout: float = 10,
+    ):
+        self.tel = tel
+        self.logger = tel.logger()
+        self.db = db
+        self.redis_client = redis_client
+        self.loom_authorization_client = loom_authorization_client
+        self.account_service = account_service
+        self.password_hasher = password_hasher
+        self.authorization_cache = authorization_cache
+        self.jwt_verifier = jwt_verifier
+        self.alert_manager = alert_manager
+        self.warmup_connections = warmup_connections
+        self.warmup_timeout = warmup_timeout
+        self.drain_timeout = drain_timeout
+
+        self.is_ready = False
+
+    @asynccontextmanager
+    async def __call__(self, app: FastAPI) -> AsyncIterator[None]:
+        await self.startup()
+        try:
+            yield
+        finally:
+            await self.shutdown()
+
+    async def startup(self) -> None:
+        # Сервер не начинает принимать запросы, пока не завершится startup
+        await asyncio.gather(
+            self._warmup("postgres", self.db.warmup),
+            self._warmup("redis", self.redis_client.warmup),
+            self._warmup("loom-authorization", self.loom_authorization_client.warmup),
+        )
+        self.is_ready = True
+        self.logger.info("Сервис готов принимать запросы", {"warmup_connections": self.warmup_connections})
+
+    async def shutdown(self) -> None:
+        # Входящие запросы к этому моменту уже дождался сервер, остаются фоновые задачи и соединения
+        self.is_ready = False
+        self.logger.info("Остановка сервиса")
+
+        await self.account_service.drain(self.drain_timeout)
+        # Фоновые обновления кэша авторизации и ключей JWT используют клиент loom-authorization
+        await self.authorization_cache.close()
+        if self.jwt_verifier is not None:
+            await self.jwt_verifier.close()
+
+        for name, close in (
+            ("loom-authorization", self.loom_authorization_client.close),
+            ("redis", self.redis_client.aclose),
+            ("postgres", self.db.close),
+        ):
+            try:
+                await close()
+            except Exception as err:
+                self.logger.warning(f"Не удалось закрыть соединения {name}", {common.ERROR_KEY: str(err)})
+
+        await asyncio.to_thread(self.password_hasher.shutdown)
+        if self.alert_manager is not None:
+            try:
+                await self.alert_manager.close(self.drain_timeout)
+            except Exception as err:
+                self.logger.warning("Не удалось остановить отправку алертов", {common.ERROR_KEY: str(err)})
+        # Последним, чтобы батч-процессоры выгрузили в том числе логи остановки
+        await asyncio.to_thread(self.tel.shutdown)
+
+    async def _warmup(self, name: str, warmup) -> None:
+        try:
+            await asyncio.wait_for(warmup(self.warmup_connections), self.warmup_timeout)
+        except Exception as err:
+            # Недоступная зависимость не должна блокировать запуск, соединения откроются по первому запросу
+            self.logger.warning(f"Не удалось прогреть соединения {name}", {common.ERROR_KEY: str(err)})
@@ -1,33 +1,87 @@
-class ErrTwoFaAlreadyEnabled(Exception):
+class ErrDomain(Exception):
+    # Ожидаемые ошибки бизнес-логики: отдаются клиенту как есть, без traceback и алертов
+    status_code = 400
+
+    @property
+    def headers(self) -> dict[str, str] | None:
+        return None
+
+    def __str__(self):
+        return "Bad request"
+
+
+class ErrTwoFaAlreadyEnabled(ErrDomain):
+    status_code = 409
+
     def __str__(self):
         return "TwoFA is already enabled for this account"
 
 
-class ErrTwoFaCodeInvalid(Exception):
+class ErrTwoFaCodeInvalid(ErrDomain):
+    status_code = 400
+
     def __str__(self):
         return "TwoFA code is invalid"
 
 
-class ErrTwoFaNotEnabled(Exception):
+class ErrTwoFaNotEnabled(ErrDomain):
+    status_code = 409
+
     def __str__(self):
         return "TwoFA is not enabled"
 
 
-class ErrUnauthorized(Exception):
+class ErrUnauthorized(ErrDomain):
+    status_code = 401
+
     def __str__(self):
         return "Unauthorized"
 
 
-class ErrInvalidPassword(Exception):
+class ErrInvalidPassword(ErrDomain):
+    status_code = 401
+
     def __str__(self):
         return "Invalid password"
 
 
-class ErrAccountCreate(Exception):
+class ErrAccountCreate(ErrDomain):
+    status_code = 409
+
     def __str__(self):
         return "Unable to create account"
 
 
-class ErrAccountNotFound(Exception):
+class ErrAccountNotFound(ErrDomain):
+    status_code = 404
+
     def __str__(self):
         return "Account not found"
+
+
+class ErrServiceOverloaded(ErrDomain):
+    status_code = 503
+
+    def __init__(self, retry_after: int = 1):
+        self.retry_after = retry_after
+
+    @property
+    def headers(self) -> dict[str, str] | None:
+        return {"Retry-After": str(self.retry_after)}
+
+    def __str__(self):
+        return "Service is overloaded, retry later"
+
+
+class ErrTooManyRequests(ErrDomain):
+    status_code = 429
+
+    def __init__(self, retry_after: int = 1):
+        self.retry_after = retry_after
+
+    @property
+    def headers(self) -> dict[str, str] | None:
+        return {"Retry-After": str(self.retry_after)}
+
+    def __str__(self):
+        return "Too many requests"
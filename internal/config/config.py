@@ -11,6 +11,15 @@ class Config:
         self.root_path = os.getenv("ROOT_PATH", "/")
         self.prefix = os.getenv("LOOM_ACCOUNT_PREFIX", "/api/account")
         self.log_level = os.getenv("LOG_LEVEL", "INFO")
+        # Количество процессов в prod, 0 - по числу доступных ядер
+        self.http_workers = int(os.getenv("LOOM_ACCOUNT_HTTP_WORKERS", "0"))
+        self.http_graceful_timeout = int(os.getenv("LOOM_ACCOUNT_HTTP_GRACEFUL_TIMEOUT", "30"))
+        self.http_worker_timeout = int(os.getenv("LOOM_ACCOUNT_HTTP_WORKER_TIMEOUT", "60"))
+        self.http_keepalive = int(os.getenv("LOOM_ACCOUNT_HTTP_KEEPALIVE", "5"))
+        # Сколько соединений к каждой зависимости открыть до приема запросов
+        self.warmup_connections = int(os.getenv("LOOM_ACCOUNT_WARMUP_CONNECTIONS", "5"))
+        self.warmup_timeout = float(os.getenv("LOOM_ACCOUNT_WARMUP_TIMEOUT", "10"))
+        self.shutdown_drain_timeout = float(os.getenv("LOOM_ACCOUNT_SHUTDOWN_DRAIN_TIMEOUT", "10"))
 
         # Настройки базы данных
         self.db_host = os.getenv("LOOM_ACCOUNT_POSTGRES_CONTAINER_NAME", "localhost")
@@ -18,11 +27,36 @@ class Config:
         self.db_name = os.getenv("LOOM_ACCOUNT_POSTGRES_DB_NAME", "hr_interview")
         self.db_user = os.getenv("LOOM_ACCOUNT_POSTGRES_USER", "postgres")
         self.db_pass = os.getenv("LOOM_ACCOUNT_POSTGRES_PASSWORD", "password")
+        # sqlalchemy или asyncpg
+        self.db_engine = os.getenv("LOOM_ACCOUNT_DB_ENGINE", "sqlalchemy")
+        self.db_pool_size = int(os.getenv("LOOM_ACCOUNT_DB_POOL_SIZE", "15"))
+        self.db_max_overflow = int(os.getenv("LOOM_ACCOUNT_DB_MAX_OVERFLOW", "15"))
+        self.db_pool_recycle = int(os.getenv("LOOM_ACCOUNT_DB_POOL_RECYCLE", "300"))
+        self.db_pool_timeout = int(os.getenv("LOOM_ACCOUNT_DB_POOL_TIMEOUT", "30"))
+        # Окно объединения запросов аккаунтов по id, 0 - один тик цикла событий
+        self.db_batch_window_ms = int(os.getenv("LOOM_ACCOUNT_DB_BATCH_WINDOW_MS", "0"))
+
+        # Настройки Redis сервиса
+        self.redis_host = os.getenv("LOOM_ACCOUNT_REDIS_CONTAINER_NAME", "localhost")
+        self.redis_port = int(os.getenv("LOOM_ACCOUNT_REDIS_PORT", "6379"))
+        self.redis_db = int(os.getenv("LOOM_ACCOUNT_REDIS_DB", "0"))
+        self.redis_password = os.getenv("LOOM_ACCOUNT_REDIS_PASSWORD", "")
+        self.account_cache_ttl = int(os.getenv("LOOM_ACCOUNT_CACHE_TTL", "300"))
 
         # Настройки мониторинга и алертов
         self.alert_tg_bot_token = os.getenv("LOOM_ALERT_TG_BOT_TOKEN", "")
         self.alert_tg_chat_id = int(os.getenv("LOOM_ALERT_TG_CHAT_ID", "0"))
         self.alert_tg_chat_thread_id = int(os.getenv("LOOM_ALERT_TG_CHAT_THREAD_ID", "0"))
+        # Повторные алерты по одному trace в течение этого времени не отправляются
+        self.alert_dedup_ttl = int(os.getenv("LOOM_ALERT_DEDUP_TTL", "30"))
+        # Очередь алертов и число отправляющих их воркеров, при переполнении алерты отбрасываются
+        self.alert_queue_size = int(os.getenv("LOOM_ALERT_QUEUE_SIZE", "100"))
+        self.alert_workers = int(os.getenv("LOOM_ALERT_WORKERS", "2"))
+        # Повторы одной ошибки (по fingerprint) в течение окна отправляются одним дайджестом
+        self.alert_digest_window = float(os.getenv("LOOM_ALERT_DIGEST_WINDOW", "60"))
+        # Время хранения анализа LLM для fingerprint ошибки
+        self.alert_analysis_cache_ttl = int(os.getenv("LOOM_ALERT_ANALYSIS_CACHE_TTL", "86400"))
+        self.alert_tg_rate_per_minute = float(os.getenv("LOOM_ALERT_TG_RATE_PER_MINUTE", "20"))
         self.grafana_url = os.getenv("LOOM_GRAFANA_URL", "")
 
         self.monitoring_redis_host = os.getenv("LOOM_MONITORING_REDIS_CONTAINER_NAME", "localhost")
@@ -33,8 +67,54 @@ class Config:
         # Настройки OpenTelemetry
         self.otlp_host = os.getenv("LOOM_OTEL_COLLECTOR_CONTAINER_NAME", "loom-otel-collector")
         self.otlp_port = int(os.getenv("LOOM_OTEL_COLLECTOR_GRPC_PORT", "4317"))
+        # Доля trace'ов, выбираемых при старте корневого span'а
+        self.trace_sample_ratio = float(os.getenv("LOOM_ACCOUNT_TRACE_SAMPLE_RATIO", "1.0"))
+        # Из невыбранных trace'ов экспортируются только содержащие ошибку или медленнее порога
+        self.trace_tail_sampling = os.getenv("LOOM_ACCOUNT_TRACE_TAIL_SAMPLING", "false").lower() == "true"
+        self.trace_tail_latency_threshold_ms = int(os.getenv("LOOM_ACCOUNT_TRACE_TAIL_LATENCY_THRESHOLD_MS", "1000"))
+        # Размер очереди записей лога для экспорта в фоновом потоке, 0 - экспорт прямо в запросе
+        self.log_queue_size = int(os.getenv("LOOM_ACCOUNT_LOG_QUEUE_SIZE", "0"))
+        # Поведение при переполненной очереди: drop - отбросить запись, block - ждать места
+        self.log_queue_overflow = os.getenv("LOOM_ACCOUNT_LOG_QUEUE_OVERFLOW", "drop")
 
         # Настройки авторизации
         self.loom_authorization_host = os.getenv("LOOM_AUTHORIZATION_CONTAINER_NAME", "loom-authorization-postgres")
         self.loom_authorization_port = os.getenv("LOOM_AUTHORIZATION_PORT", "8001")
         self.password_secret_key = os.getenv("LOOM_PASSWORD_SECRET_KEY", "default-secret-key-change-me")
+        self.authorization_cache_size = int(os.getenv("LOOM_ACCOUNT_AUTHORIZATION_CACHE_SIZE", "10000"))
+        self.authorization_cache_ttl = float(os.getenv("LOOM_ACCOUNT_AUTHORIZATION_CACHE_TTL", "30"))
+        # Сколько после TTL результат еще отдается, пока обновляется в фоне
+        self.authorization_cache_stale_ttl = float(os.getenv("LOOM_ACCOUNT_AUTHORIZATION_CACHE_STALE_TTL", "30"))
+        # remote - проверка токена в loom-authorization, jwt - локальная проверка подписи по набору ключей
+        self.authorization_backend = os.getenv("LOOM_ACCOUNT_AUTHORIZATION_BACKEND", "remote")
+        self.authorization_jwt_algorithms = os.getenv("LOOM_ACCOUNT_AUTHORIZATION_JWT_ALGORITHMS", "RS256").split(",")
+        self.authorization_jwks_refresh_interval = float(
+            os.getenv("LOOM_ACCOUNT_AUTHORIZATION_JWKS_REFRESH_INTERVAL", "300")
+        )
+        # Маршруты, на которых токен всегда проверяется в loom-authorization, чтобы учесть его отзыв
+        self.authorization_revocation_check_paths = os.getenv(
+            "LOOM_ACCOUNT_AUTHORIZATION_REVOCATION_CHECK_PATHS", "/password/change,/2fa/delete"
+        ).split(",")
+
+        # Настройки хеширования паролей
+        self.password_hasher_backend = os.getenv("LOOM_ACCOUNT_PASSWORD_HASHER_BACKEND", "thread")
+        self.password_hasher_workers = int(os.getenv("LOOM_ACCOUNT_PASSWORD_HASHER_WORKERS", "4"))
+        self.password_hash_cost = int(os.getenv("LOOM_ACCOUNT_PASSWORD_HASH_COST", "12"))
+        # Целевое время хеширования для калибровки стоимости bcrypt, 0 - калибровка отключена
+        self.password_hash_target_ms = int(os.getenv("LOOM_ACCOUNT_PASSWORD_HASH_TARGET_MS", "0"))
+        self.password_hash_min_cost = int(os.getenv("LOOM_ACCOUNT_PASSWORD_HASH_MIN_COST", "10"))
+        self.password_hash_max_cost = int(os.getenv("LOOM_ACCOUNT_PASSWORD_HASH_MAX_COST", "14"))
+
+        # Ограничение нагрузки на хеширование паролей
+        self.password_hash_max_in_flight = int(os.getenv("LOOM_ACCOUNT_PASSWORD_HASH_MAX_IN_FLIGHT", "8"))
+        self.password_hash_max_queue_wait_ms = int(os.getenv("LOOM_ACCOUNT_PASSWORD_HASH_MAX_QUEUE_WAIT_MS", "1000"))
+
+        # Лимиты запросов: количество в минуту и допустимый всплеск
+        self.rate_limit_login_per_minute = float(os.getenv("LOOM_ACCOUNT_RATE_LIMIT_LOGIN_PER_MINUTE", "10"))
+        self.rate_limit_login_burst = int(os.getenv("LOOM_ACCOUNT_RATE_LIMIT_LOGIN_BURST", "5"))
+        self.rate_limit_client_per_minute = float(os.getenv("LOOM_ACCOUNT_RATE_LIMIT_CLIENT_PER_MINUTE", "60"))
+        self.rate_limit_client_burst = int(os.getenv("LOOM_ACCOUNT_RATE_LIMIT_CLIENT_BURST", "20"))
+        self.rate_limit_account_per_minute = float(os.getenv("LOOM_ACCOUNT_RATE_LIMIT_ACCOUNT_PER_MINUTE", "30"))
+        self.rate_limit_account_burst = int(os.getenv("LOOM_ACCOUNT_RATE_LIMIT_ACCOUNT_BURST", "10"))
+        # Число доверенных прокси перед сервисом, дописывающих X-Forwarded-For; 0 - заголовок игнорируется
+        self.trusted_proxy_count = int(os.getenv("LOOM_ACCOUNT_TRUSTED_PROXY_COUNT", "0"))
@@ -20,14 +20,20 @@ class AccountController(interface.IAccountController):
         self,
         tel: interface.ITelemetry,
         account_service: interface.IAccountService,
+        rate_limiter: interface.IRateLimiter,
+        trusted_proxy_count: int = 0,
     ):
         self.tracer = tel.tracer()
         self.logger = tel.logger()
         self.account_service = account_service
+        self.rate_limiter = rate_limiter
+        self.trusted_proxy_count = trusted_proxy_count
 
     @auto_log()
     @traced_method()
-    async def register(self, body: RegisterBody) -> JSONResponse:
+    async def register(self, request: Request, body: RegisterBody) -> JSONResponse:
+        await self.rate_limiter.check("register", {"login": body.login, "client": self._client_address(request)})
+
         authorization_data = await self.account_service.register(login=body.login, password=body.password)
 
         response = JSONResponse(status_code=201, content={"account_id": authorization_data.account_id})
@@ -47,7 +53,9 @@ class AccountController(interface.IAccountController):
 
     @auto_log()
     @traced_method()
-    async def register_from_tg(self, body: RegisterBody) -> JSONResponse:
+    async def register_from_tg(self, request: Request, body: RegisterBody) -> JSONResponse:
+        await self.rate_limiter.check("register", {"login": body.login, "client": self._client_address(request)})
+
         authorization_data = await self.account_service.register_from_tg(login=body.login, password=body.password)
 
         response = JSONResponse(status_code=201, content={"account_id": authorization_data.account_id})
@@ -63,7 +71,9 @@ class AccountController(interface.IAccountController):
 
     @auto_log()
     @traced_method()
-    async def login(self, body: LoginBody) -> JSONResponse:
+    async def login(self, request: Request, body: LoginBody) -> JSONResponse:
+        await self.rate_limiter.check("login", {"login": body.login, "client": self._client_address(request)})
+
         authorization_data = await self.account_service.login(login=body.login, password=body.password)
 
         response = JSONResponse(status_code=200, content={"account_id": authorization_data.account_id})
@@ -85,6 +95,9 @@ class AccountController(interface.IAccountController):
 
         if account_id == 0:
             return JSONResponse(status_code=403, content={})
+
+        await self.rate_limiter.check("2fa", {"account": str(account_id), "client": self._client_address(request)})
+
         two_fa_key, qr_image = await self.account_service.generate_two_fa_key(account_id)
 
         def iterfile():
@@ -114,6 +127,8 @@ class AccountController(interface.IAccountController):
         if account_id == 0:
             return JSONResponse(status_code=403, content={})
 
+        await self.rate_limiter.check("2fa", {"account": str(account_id), "client": self._client_address(request)})
+
         await self.account_service.set_two_fa_key(
             account_id=account_id, google_two_fa_key=body.google_two_fa_key, google_two_fa_code=body.google_two_fa_code
         )
@@ -128,6 +143,8 @@ class AccountController(interface.IAccountController):
         if account_id == 0:
             return JSONResponse(status_code=403, content={})
 
+        await self.rate_limiter.check("2fa", {"account": str(account_id), "client": self._client_address(request)})
+
         await self.account_service.delete_two_fa_key(account_id=account_id, google_two_fa_code=body.google_two_fa_code)
 
         return JSONResponse(status_code=200, content={})
@@ -141,6 +158,8 @@ class AccountController(interface.IAccountController):
         if account_id == 0:
             return JSONResponse(status_code=403, content={})
 
+        await self.rate_limiter.check("2fa", {"account": str(account_id), "client": self._client_address(request)})
+
         is_valid = await self.account_service.verify_two(
             account_id=account_id, google_two_fa_code=body.google_two_fa_code
         )
@@ -174,3 +193,17 @@ class AccountController(interface.IAccountController):
         )
 
         return JSONResponse(status_code=200, content={})
+
+    def _client_address(self, request: Request) -> str:
+        peer = request.client.host if request.client else "unknown"
+        if self.trusted_proxy_count <= 0:
+            return peer
+
+        # Левые значения задает сам клиент, доверять можно только адресу, дописанному ближайшим к клиенту нашим прокси
+        forwarded_for = request.headers.get("X-Forwarded-For")
+        if not forwarded_for:
+            return peer
+        hops = [hop.strip() for hop in forwarded_for.split(",")]
+        if len(hops) < self.trusted_proxy_count:
+            return peer
+        return hops[-self.trusted_proxy_count]
@@ -0,0 +1,122 @@
+import asyncio
+import base64
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from internal import common, interface, model
+from pkg.single_flight import SingleFlight
+
+
+@dataclass(slots=True)
+class _Entry:
+    authorization_data: model.AuthorizationData
+    fresh_until: float
+    expires_at: float
+
+
+class AuthorizationCache:
+    def __init__(
+        self,
+        tel: interface.ITelemetry,
+        loom_authorization_client: interface.ILoomAuthorizationClient,
+        max_size: int = 10000,
+        ttl: float = 30,
+        stale_ttl: float = 30,
+    ):
+        self.logger = tel.logger()
+        self.loom_authorization_client = loom_authorization_client
+        self.max_size = max_size
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+
+        # sha256 токена -> результат проверки, порядок ключей - порядок последнего обращения
+        self._entries: OrderedDict[bytes, _Entry] = OrderedDict()
+        self._single_flight = SingleFlight(tel, "authorization_cache")
+        # Фоновые обновления по ключу, ссылка на задачу нужна, чтобы ее не собрал GC
+        self._refreshing: dict[bytes, asyncio.Task] = {}
+
+        meter = tel.meter()
+        self.hits = meter.create_counter(
+            "authorization_cache.hit",
+            description="Количество проверок авторизации, обслуженных из кэша",
+        )
+        self.misses = meter.create_counter(
+            "authorization_cache.miss",
+            description="Количество проверок авторизации, ушедших в loom-authorization",
+        )
+
+    async def check_authorization(self, access_token: str) -> model.AuthorizationData:
+        key = hashlib.sha256(access_token.encode("utf-8")).digest()
+        now = time.monotonic()
+
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at > now:
+            self._entries.move_to_end(key)
+            if entry.fresh_until > now:
+                self.hits.add(1, {"state": "fresh"})
+            else:
+                # Отдаем устаревший результат сразу, а обновляем его в фоне
+                self.hits.add(1, {"state": "stale"})
+                self._refresh_in_background(key, access_token)
+            return entry.authorization_data
+
+        self.misses.add(1)
+        return await self._single_flight.do(key, lambda: self._fetch(key, access_token))
+
+    async def close(self) -> None:
+        # Фоновые обновления ходят в loom-authorization, поэтому завершаются до закрытия клиента
+        tasks = list(self._refreshing.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _fetch(self, key: bytes, access_token: str) -> model.AuthorizationData:
+        authorization_data = await self.loom_authorization_client.check_authorization(access_token)
+        # Отказы не кэшируем: токен могли обновить, а ошибка сервиса авторизации временная
+        if authorization_data.status_code == 200:
+            self._store(key, access_token, authorization_data)
+        else:
+            self._entries.pop(key, None)
+        return authorization_data
+
+    def _refresh_in_background(self, key: bytes, access_token: str) -> None:
+        if key in self._refreshing:
+            return
+        task = asyncio.create_task(self._refresh(key, access_token))
+        self._refreshing[key] = task
+        task.add_done_callback(lambda _: self._refreshing.pop(key, None))
+
+    async def _refresh(self, key: bytes, access_token: str) -> None:
+        try:
+            await self._single_flight.do(key, lambda: self._fetch(key, access_token))
+        except Exception as err:
+            self.logger.warning("Не удалось обновить результат проверки авторизации", {common.ERROR_KEY: str(err)})
+
+    def _store(self, key: bytes, access_token: str, authorization_data: model.AuthorizationData) -> None:
+        now = time.monotonic()
+        expires_at = now + self.ttl + self.stale_ttl
+
+        token_expires_in = _token_expires_in(access_token)
+        if token_expires_in is not None:
+            # Результат не должен пережить сам токен
+            expires_at = min(expires_at, now + token_expires_in)
+        if expires_at <= now:
+            return
+
+        self._entries[key] = _Entry(authorization_data, min(now + self.ttl, expires_at), expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+
+def _token_expires_in(access_token: str) -> float | None:
+    # Подпись не проверяем: токен уже проверен loom-authorization, нужен только exp
+    try:
+        payload = access_token.split(".")[1]
+        claims = json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+        return float(claims["exp"]) - time.time()
+    except (IndexError, KeyError, TypeError, ValueError):
+        return None
@@ -0,0 +1,128 @@
+import asyncio
+import time
+
+import jwt
+
+from internal import common, interface, model
+
+from .authorization_cache import AuthorizationCache
+
+_REQUIRED_CLAIMS = ["exp", "account_id", "two_fa_status", "role"]
+
+
+class JwtVerifier:
+    def __init__(
+        self,
+        tel: interface.ITelemetry,
+        loom_authorization_client: interface.ILoomAuthorizationClient,
+        authorization_cache: AuthorizationCache,
+        algorithms: list[str],
+        jwks_refresh_interval: float = 300,
+        jwks_min_refresh_interval: float = 30,
+    ):
+        self.logger = tel.logger()
+        self.loom_authorization_client = loom_authorization_client
+        self.authorization_cache = authorization_cache
+        self.algorithms = algorithms
+        self.jwks_refresh_interval = jwks_refresh_interval
+        self.jwks_min_refresh_interval = jwks_min_refresh_interval
+
+        # kid -> публичный ключ из последнего загруженного набора
+        self._keys: dict[str, jwt.PyJWK] = {}
+        self._keys_fetched_at: float | None = None
+        self._keys_lock = asyncio.Lock()
+        self._refresh_task: asyncio.Task | None = None
+
+        meter = tel.meter()
+        self.verified = meter.create_counter(
+            "jwt_verifier.verified",
+            description="Количество токенов, проверенных локально",
+        )
+        self.fallbacks = meter.create_counter(
+            "jwt_verifier.fallback",
+            description="Количество токенов, отправленных на проверку в loom-authorization",
+        )
+
+    async def check_authorization(
+        self, access_token: str, require_revocation_check: bool = False
+    ) -> model.AuthorizationData:
+        if require_revocation_check:
+            # Отзыв токена виден только loom-authorization, кэш здесь тоже не подходит
+            self.fallbacks.add(1, {"reason": "revocation_check"})
+            return await self.loom_authorization_client.check_authorization(access_token)
+
+        try:
+            key_id = jwt.get_unverified_header(access_token).get("kid")
+        except jwt.InvalidTokenError:
+            return _forbidden("invalid token")
+
+        key = await self._key(key_id)
+        if key is None:
+            self.fallbacks.add(1, {"reason": "unknown_key"})
+            return await self.authorization_cache.check_authorization(access_token)
+
+        try:
+            claims = jwt.decode(
+                access_token,
+                key,
+                algorithms=self.algorithms,
+                options={"require": _REQUIRED_CLAIMS},
+            )
+        except jwt.ExpiredSignatureError:
+            return _forbidden("token expired")
+        except jwt.InvalidTokenError:
+            return _forbidden("invalid token")
+
+        self.verified.add(1)
+        return model.AuthorizationData(
+            account_id=int(claims["account_id"]),
+            two_fa_status=bool(claims["two_fa_status"]),
+            role=str(claims["role"]),
+            message="",
+            status_code=200,
+        )
+
+    async def close(self) -> None:
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            await asyncio.gather(self._refresh_task, return_exceptions=True)
+
+    async def _key(self, key_id: str | None) -> jwt.PyJWK | None:
+        if self._keys_fetched_at is None:
+            await self._refresh_keys()
+        elif self._keys_age() > self.jwks_refresh_interval:
+            self._refresh_in_background()
+
+        key = self._keys.get(key_id)
+        if key is None and self._keys_age() > self.jwks_min_refresh_interval:
+            # Неизвестный kid - вероятно, ключи ротировали; перечитываем набор не чаще минимального интервала
+            self._refresh_in_background()
+        return key
+
+    def _refresh_in_background(self) -> None:
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._refresh_keys())
+
+    async def _refresh_keys(self) -> None:
+        async with self._keys_lock:
+            if self._keys_fetched_at is not None and self._keys_age() < self.jwks_min_refresh_interval:
+                return
+            fetched_at = time.monotonic()
+
+            try:
+                key_set = jwt.PyJWKSet.from_dict(await self.loom_authorization_client.jwks())
+            except Exception as err:
+                # Остаемся на прежних ключах, неизвестные kid уйдут на удаленную проверку
+                self.logger.warning("Не удалось загрузить набор ключей JWT", {common.ERROR_KEY: str(err)})
+                self._keys_fetched_at = fetched_at
+                return
+
+            self._keys = {key.key_id: key for key in key_set.keys if key.key_id}
+            self._keys_fetched_at = fetched_at
+
+    def _keys_age(self) -> float:
+        return time.monotonic() - self._keys_fetched_at
+
+
+def _forbidden(message: str) -> model.AuthorizationData:
+    return model.AuthorizationData(account_id=0, two_fa_status=False, role="guest", message=message, status_code=403)
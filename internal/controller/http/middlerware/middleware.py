@@ -1,135 +1,170 @@
-from collections.abc import Callable
 from contextvars import ContextVar
+from typing import TYPE_CHECKING
 
-from fastapi import FastAPI, Request
+from fastapi import Request
 from fastapi.responses import JSONResponse
 from opentelemetry import propagate
 from opentelemetry.semconv.trace import SpanAttributes
 from opentelemetry.trace import SpanKind, Status, StatusCode
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 from internal import common, interface, model
 
+from .authorization_cache import AuthorizationCache
+
+if TYPE_CHECKING:
+    # PyJWT нужен только при локальной проверке токенов
+    from .jwt_verifier import JwtVerifier
+
 
 class HttpMiddleware(interface.IHttpMiddleware):
     def __init__(
         self,
         tel: interface.ITelemetry,
-        loom_authorization_client: interface.ILoomAuthorizationClient,
+        authorization_cache: AuthorizationCache,
         prefix: str,
         log_context: ContextVar[dict],
+        jwt_verifier: "JwtVerifier | None" = None,
+        revocation_check_paths: list[str] = None,
     ):
         self.tracer = tel.tracer()
         self.meter = tel.meter()
         self.logger = tel.logger()
         self.prefix = prefix
-        self.loom_authorization_client = loom_authorization_client
+        self.authorization_cache = authorization_cache
+        self.jwt_verifier = jwt_verifier
+        self.revocation_check_paths = revocation_check_paths or []
         self.log_context = log_context
 
-    def trace_middleware01(self, app: FastAPI):
-        @app.middleware("http")
-        async def _trace_middleware01(request: Request, call_next: Callable):
-            if self.prefix not in request.url.path:
-                return JSONResponse(status_code=404, content={"error": "not found"})
+    def trace_middleware01(self, app: ASGIApp) -> ASGIApp:
+        async def _trace_middleware01(scope: Scope, receive: Receive, send: Send):
+            if scope["type"] != "http":
+                return await app(scope, receive, send)
+
+            path = scope["path"]
+            if self.prefix not in path:
+                return await JSONResponse(status_code=404, content={"error": "not found"})(scope, receive, send)
+
+            headers = Headers(scope=scope)
             with self.tracer.start_as_current_span(
-                f"{request.method} {request.url.path}",
-                context=propagate.extract(dict(request.headers)),
+                f"{scope['method']} {path}",
+                context=propagate.extract(headers),
                 kind=SpanKind.SERVER,
                 attributes={
-                    SpanAttributes.HTTP_ROUTE: str(request.url.path),
-                    SpanAttributes.HTTP_METHOD: request.method,
+                    SpanAttributes.HTTP_ROUTE: str(path),
+                    SpanAttributes.HTTP_METHOD: scope["method"],
                 },
             ) as root_span:
-                try:
-                    response = await call_next(request)
-
-                    status_code = response.status_code
-                    response_size = response.headers.get("content-length")
-
-                    root_span.set_attributes(
-                        {
-                            SpanAttributes.HTTP_STATUS_CODE: status_code,
-                        }
-                    )
+                response_started = False
+
+                async def send_wrapper(message: Message):
+                    nonlocal response_started
+                    if message["type"] == "http.response.start":
+                        response_started = True
+                        root_span.set_attributes(
+                            {
+                                SpanAttributes.HTTP_STATUS_CODE: message["status"],
+                            }
+                        )
 
-                    if response_size:
-                        try:
-                            root_span.set_attribute(SpanAttributes.HTTP_RESPONSE_BODY_SIZE, int(response_size))
-                        except ValueError:
-                            pass
+                        response_size = Headers(raw=message["headers"]).get("content-length")
+                        if response_size:
+                            try:
+                                root_span.set_attribute(SpanAttributes.HTTP_RESPONSE_BODY_SIZE, int(response_size))
+                            except ValueError:
+                                pass
+                    await send(message)
 
+                try:
+                    await app(scope, receive, send_wrapper)
                     root_span.set_status(Status(StatusCode.OK))
 
-                    return response
-
                 except Exception as err:
                     root_span.set_status(StatusCode.ERROR, str(err))
-                    return JSONResponse(
-                        status_code=500,
-                        content={"message": "Internal Server Error"},
-                    )
+                    # Если ответ уже начали отправлять, заменить его на 500 нельзя
+                    if not response_started:
+                        await JSONResponse(
+                            status_code=500,
+                            content={"message": "Internal Server Error"},
+                        )(scope, receive, send)
 
         return _trace_middleware01
 
-    def logger_middleware02(self, app: FastAPI):
-        @app.middleware("http")
-        async def _logger_middleware02(request: Request, call_next: Callable):
+    def logger_middleware02(self, app: ASGIApp) -> ASGIApp:
+        async def _logger_middleware02(scope: Scope, receive: Receive, send: Send):
+            if scope["type"] != "http":
+                return await app(scope, receive, send)
+
+            headers = Headers(scope=scope)
             context_token = self.log_context.set(
                 {
-                    common.TELEGRAM_USER_USERNAME_KEY: request.headers.get(common.TELEGRAM_USER_USERNAME_KEY, ""),
-                    common.TELEGRAM_CHAT_ID_KEY: request.headers.get(common.TELEGRAM_CHAT_ID_KEY, "0"),
-                    common.TELEGRAM_EVENT_TYPE_KEY: request.headers.get(common.TELEGRAM_EVENT_TYPE_KEY, ""),
-                    common.ORGANIZATION_ID_KEY: request.headers.get(common.ORGANIZATION_ID_KEY, "0"),
-                    common.ACCOUNT_ID_KEY: request.headers.get(common.ACCOUNT_ID_KEY, "0"),
+                    common.TELEGRAM_USER_USERNAME_KEY: headers.get(common.TELEGRAM_USER_USERNAME_KEY, ""),
+                    common.TELEGRAM_CHAT_ID_KEY: headers.get(common.TELEGRAM_CHAT_ID_KEY, "0"),
+                    common.TELEGRAM_EVENT_TYPE_KEY: headers.get(common.TELEGRAM_EVENT_TYPE_KEY, ""),
+                    common.ORGANIZATION_ID_KEY: headers.get(common.ORGANIZATION_ID_KEY, "0"),
+                    common.ACCOUNT_ID_KEY: headers.get(common.ACCOUNT_ID_KEY, "0"),
                 }
             )
-            try:
-                response = await call_next(request)
-
-                status_code = response.status_code
 
-                if 400 <= status_code < 500:
+            async def send_wrapper(message: Message):
+                if message["type"] == "http.response.start" and 400 <= message["status"] < 500:
                     self.logger.warning("Обработка HTTP запроса завершена с ошибкой клиента")
+                await send(message)
 
-                return response
+            try:
+                await app(scope, receive, send_wrapper)
             finally:
                 self.log_context.reset(context_token)
 
         return _logger_middleware02
 
-    def authorization_middleware03(self, app: FastAPI):
-        @app.middleware("http")
-        async def _authorization_middleware03(request: Request, call_next: Callable):
+    def authorization_middleware03(self, app: ASGIApp) -> ASGIApp:
+        async def _authorization_middleware03(scope: Scope, receive: Receive, send: Send):
+            if scope["type"] != "http":
+                return await app(scope, receive, send)
+
             with self.tracer.start_as_current_span(
                 "HttpMiddleware.authorization_middleware",
                 kind=SpanKind.INTERNAL,
             ) as span:
                 try:
-                    if "login" in request.url.path or "register" in request.url.path:
-                        response = await call_next(request)
+                    path = scope["path"]
+                    if "login" in path or "register" in path:
+                        await app(scope, receive, send)
 
                         span.set_status(StatusCode.OK)
-                        return response
+                        return
 
-                    access_token = request.cookies.get("Access-Token")
+                    access_token = Request(scope).cookies.get("Access-Token")
                     if not access_token:
                         authorization_data = model.AuthorizationData(
                             account_id=0, two_fa_status=False, role="guest", message="guest", status_code=200
                         )
+                    elif self.jwt_verifier is not None:
+                        authorization_data = await self.jwt_verifier.check_authorization(
+                            access_token, self._requires_revocation_check(path)
+                        )
                     else:
-                        authorization_data = await self.loom_authorization_client.check_authorization(access_token)
+                        authorization_data = await self.authorization_cache.check_authorization(access_token)
 
-                    request.state.authorization_data = authorization_data
+                    # request.state обработчиков читает scope["state"]
+                    scope.setdefault("state", {})["authorization_data"] = authorization_data
 
                     if authorization_data.status_code == 403:
                         self.logger.warning(authorization_data.message)
-                        return JSONResponse(status_code=403, content={"error": authorization_data.message})
+                        response = JSONResponse(status_code=403, content={"error": authorization_data.message})
+                        await response(scope, receive, send)
+                        return
 
-                    response = await call_next(request)
+                    await app(scope, receive, send)
 
                     span.set_status(StatusCode.OK)
-                    return response
                 except Exception as e:
                     span.set_status(StatusCode.ERROR, str(e))
                     raise e
 
         return _authorization_middleware03
+
+    def _requires_revocation_check(self, path: str) -> bool:
+        return any(path.endswith(revocation_check_path) for revocation_check_path in self.revocation_check_paths)
@@ -1,5 +1,6 @@
 import io
 from abc import abstractmethod
+from contextlib import AbstractAsyncContextManager
 from typing import Protocol
 
 from fastapi import Request
@@ -14,19 +15,20 @@ from internal.controller.http.handler.account.model import (
     SetTwoFaBody,
     VerifyTwoFaBody,
 )
+from internal.interface.general import ITransaction
 
 
 class IAccountController(Protocol):
     @abstractmethod
-    async def register(self, body: RegisterBody):
+    async def register(self, request: Request, body: RegisterBody):
         pass
 
     @abstractmethod
-    async def register_from_tg(self, body: RegisterBody):
+    async def register_from_tg(self, request: Request, body: RegisterBody):
         pass
 
     @abstractmethod
-    async def login(self, body: LoginBody):
+    async def login(self, request: Request, body: LoginBody):
         pass
 
     @abstractmethod
@@ -95,8 +97,16 @@ class IAccountService(Protocol):
     async def change_password(self, account_id: int, new_password: str, old_password: str) -> None:
         pass
 
+    @abstractmethod
+    async def drain(self, max_wait: float) -> None:
+        pass
+
 
 class IAccountRepo(Protocol):
+    @abstractmethod
+    def transaction(self) -> AbstractAsyncContextManager[ITransaction]:
+        pass
+
     @abstractmethod
     async def create_account(self, login: str, password: str) -> int:
         pass
@@ -110,13 +120,29 @@ class IAccountRepo(Protocol):
         pass
 
     @abstractmethod
-    async def set_two_fa_key(self, account_id: int, google_two_fa_key: str) -> None:
+    async def account_credentials_by_id(self, account_id: int) -> list[model.AccountCredentials]:
+        pass
+
+    @abstractmethod
+    async def account_credentials_by_login(self, login: str) -> list[model.AccountCredentials]:
         pass
 
     @abstractmethod
-    async def delete_two_fa_key(self, account_id: int) -> None:
+    async def account_two_fa_by_id(self, account_id: int, tx: ITransaction | None = None) -> list[model.AccountTwoFa]:
+        pass
+
+    @abstractmethod
+    async def set_two_fa_key(self, account_id: int, google_two_fa_key: str, tx: ITransaction | None = None) -> None:
+        pass
+
+    @abstractmethod
+    async def delete_two_fa_key(self, account_id: int, tx: ITransaction | None = None) -> None:
         pass
 
     @abstractmethod
     async def update_password(self, account_id: int, new_password: str) -> None:
         pass
+
+    @abstractmethod
+    async def update_password_if_unchanged(self, account_id: int, old_password: str, new_password: str) -> bool:
+        pass
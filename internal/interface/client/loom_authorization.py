@@ -16,3 +16,15 @@ class ILoomAuthorizationClient(Protocol):
     @abstractmethod
     async def check_authorization(self, access_token: str) -> model.AuthorizationData:
         pass
+
+    @abstractmethod
+    async def jwks(self) -> dict:
+        pass
+
+    @abstractmethod
+    async def warmup(self, connections: int) -> None:
+        pass
+
+    @abstractmethod
+    async def close(self) -> None:
+        pass
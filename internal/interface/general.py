@@ -1,10 +1,11 @@
 from abc import abstractmethod
 from collections.abc import Sequence
+from contextlib import AbstractAsyncContextManager
 from typing import Any, Protocol
 
-from fastapi import FastAPI
 from opentelemetry.metrics import Meter
 from opentelemetry.trace import Tracer
+from starlette.types import ASGIApp
 
 
 class IOtelLogger(Protocol):
@@ -38,18 +39,32 @@ class ITelemetry(Protocol):
     def logger(self) -> IOtelLogger:
         pass
 
+    @abstractmethod
+    def shutdown(self) -> None:
+        pass
+
+
+class IAlertManager(Protocol):
+    @abstractmethod
+    def send_error_alert(self, trace_id: str, span_id: str, traceback: str, message: str = ""):
+        pass
+
+    @abstractmethod
+    async def close(self, max_wait: float) -> None:
+        pass
+
 
 class IHttpMiddleware(Protocol):
     @abstractmethod
-    def trace_middleware01(self, app: FastAPI):
+    def trace_middleware01(self, app: ASGIApp) -> ASGIApp:
         pass
 
     @abstractmethod
-    def logger_middleware02(self, app: FastAPI):
+    def logger_middleware02(self, app: ASGIApp) -> ASGIApp:
         pass
 
     @abstractmethod
-    def authorization_middleware03(self, app: FastAPI):
+    def authorization_middleware03(self, app: ASGIApp) -> ASGIApp:
         pass
 
 
@@ -62,10 +77,62 @@ class IRedis(Protocol):
     async def get(self, key: str, default: Any = None) -> Any:
         pass
 
+    @abstractmethod
+    async def set_nx(self, key: str, value: Any, ttl: int) -> bool:
+        pass
+
+    @abstractmethod
+    async def set_bytes(self, key: str, value: bytes, ttl: int = None) -> bool:
+        pass
+
+    @abstractmethod
+    async def get_bytes(self, key: str) -> bytes | None:
+        pass
+
+    @abstractmethod
+    async def delete(self, *keys: str) -> int:
+        pass
+
+    @abstractmethod
+    async def run_script(self, script: str, keys: list[str], args: list[Any]) -> Any:
+        pass
+
+    @abstractmethod
+    async def warmup(self, connections: int) -> None:
+        pass
+
+    @abstractmethod
+    async def aclose(self) -> None:
+        pass
+
+
+class IRateLimiter(Protocol):
+    @abstractmethod
+    async def check(self, route: str, subjects: dict[str, str]) -> None:
+        pass
+
+
+class ITransaction(Protocol):
+    @abstractmethod
+    async def insert(self, query: str, query_params: dict) -> int | None:
+        pass
+
+    @abstractmethod
+    async def delete(self, query: str, query_params: dict) -> None:
+        pass
+
+    @abstractmethod
+    async def update(self, query: str, query_params: dict) -> Sequence[Any]:
+        pass
+
+    @abstractmethod
+    async def select(self, query: str, query_params: dict) -> Sequence[Any]:
+        pass
+
 
 class IDB(Protocol):
     @abstractmethod
-    async def insert(self, query: str, query_params: dict) -> int:
+    async def insert(self, query: str, query_params: dict) -> int | None:
         pass
 
     @abstractmethod
@@ -73,7 +140,7 @@ class IDB(Protocol):
         pass
 
     @abstractmethod
-    async def update(self, query: str, query_params: dict) -> None:
+    async def update(self, query: str, query_params: dict) -> Sequence[Any]:
         pass
 
     @abstractmethod
@@ -83,3 +150,37 @@ class IDB(Protocol):
     @abstractmethod
     async def multi_query(self, queries: list[str]) -> None:
         pass
+
+    @abstractmethod
+    async def multi_query_autocommit(self, queries: list[str]) -> None:
+        pass
+
+    @abstractmethod
+    def transaction(self) -> AbstractAsyncContextManager[ITransaction]:
+        pass
+
+    @abstractmethod
+    async def warmup(self, connections: int) -> None:
+        pass
+
+    @abstractmethod
+    async def close(self) -> None:
+        pass
+
+
+class IPasswordHasher(Protocol):
+    @abstractmethod
+    async def hash(self, password: str) -> str:
+        pass
+
+    @abstractmethod
+    async def verify(self, hashed_password: str, password: str) -> bool:
+        pass
+
+    @abstractmethod
+    def needs_rehash(self, hashed_password: str) -> bool:
+        pass
+
+    @abstractmethod
+    def shutdown(self) -> None:
+        pass
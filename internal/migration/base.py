@@ -7,6 +7,8 @@ class MigrationInfo:
     version: str
     name: str
     depends_on: str = None
+    # False - миграция выполняется вне транзакции, например для CREATE INDEX CONCURRENTLY
+    transactional: bool = True
 
 
 class Migration(ABC):
@@ -24,3 +26,9 @@ class Migration(ABC):
     @abstractmethod
     async def down(self, db) -> None:
         pass
+
+    async def execute(self, db, queries: list[str]) -> None:
+        if self.info.transactional:
+            await db.multi_query(queries)
+        else:
+            await db.multi_query_autocommit(queries)
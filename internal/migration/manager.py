@@ -146,6 +146,9 @@ class MigrationManager:
                     )
                     continue
 
+                if not migration.info.transactional:
+                    print(f"🔓 MigrationManager: Миграция {version} выполняется вне транзакции", flush=True)
+
                 await migration.up(self.db)
                 await self._mark_applied(migration)
                 applied.add(version)
@@ -214,6 +217,9 @@ class MigrationManager:
                         f"⬇️  MigrationManager: Откат миграции {version} ({count + 1}/{len(to_rollback)})...", flush=True
                     )
                     migration = self.migrations[version]
+                    if not migration.info.transactional:
+                        print(f"🔓 MigrationManager: Откат {version} выполняется вне транзакции", flush=True)
+
                     await migration.down(self.db)
                     await self._mark_rolled_back(version)
                     count += 1
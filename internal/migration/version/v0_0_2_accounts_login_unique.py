@@ -0,0 +1,46 @@
+from internal import interface
+from internal.migration.base import Migration, MigrationInfo
+
+
+class AccountsLoginUniqueMigration(Migration):
+    def get_info(self) -> MigrationInfo:
+        return MigrationInfo(
+            version="v0_0_2",
+            name="accounts_login_unique",
+            depends_on="v0_0_1",
+            transactional=False,
+        )
+
+    async def up(self, db: interface.IDB):
+        # Какой из аккаунтов-дублей оставить, решает человек, миграция их не удаляет
+        duplicates = await db.select(select_duplicate_logins, {})
+        if duplicates:
+            logins = ", ".join(row[0] for row in duplicates)
+            raise Exception(f"в accounts есть повторяющиеся логины, уникальный индекс не построить: {logins}")
+
+        # Без CONCURRENTLY индекс строится под блокировкой записи в таблицу
+        queries = [
+            drop_accounts_login_unique_index,
+            create_accounts_login_unique_index,
+        ]
+
+        await self.execute(db, queries)
+
+    async def down(self, db: interface.IDB):
+        queries = [drop_accounts_login_unique_index]
+
+        await self.execute(db, queries)
+
+
+select_duplicate_logins = """
+SELECT login FROM accounts GROUP BY login HAVING COUNT(*) > 1 LIMIT 10;
+"""
+
+# Индекс мог остаться невалидным после прерванного CREATE INDEX CONCURRENTLY, поэтому сначала удаляем его
+drop_accounts_login_unique_index = """
+DROP INDEX CONCURRENTLY IF EXISTS accounts_login_unique_idx;
+"""
+
+create_accounts_login_unique_index = """
+CREATE UNIQUE INDEX CONCURRENTLY accounts_login_unique_idx ON accounts (login);
+"""
@@ -0,0 +1,50 @@
+from internal import interface
+from internal.migration.base import Migration, MigrationInfo
+
+
+class AccountsLoginCoveringIndexMigration(Migration):
+    def get_info(self) -> MigrationInfo:
+        return MigrationInfo(
+            version="v0_0_3",
+            name="accounts_login_covering_index",
+            depends_on="v0_0_2",
+            transactional=False,
+        )
+
+    async def up(self, db: interface.IDB):
+        # Покрывающий индекс тоже уникальный, поэтому индекс из v0_0_2 становится лишним
+        queries = [
+            drop_accounts_login_covering_index,
+            create_accounts_login_covering_index,
+            drop_accounts_login_unique_index,
+        ]
+
+        await self.execute(db, queries)
+
+    async def down(self, db: interface.IDB):
+        queries = [
+            create_accounts_login_unique_index,
+            drop_accounts_login_covering_index,
+        ]
+
+        await self.execute(db, queries)
+
+
+# Индекс мог остаться невалидным после прерванного CREATE INDEX CONCURRENTLY, поэтому сначала удаляем его
+drop_accounts_login_covering_index = """
+DROP INDEX CONCURRENTLY IF EXISTS accounts_login_covering_idx;
+"""
+
+create_accounts_login_covering_index = """
+CREATE UNIQUE INDEX CONCURRENTLY accounts_login_covering_idx
+ON accounts (login)
+INCLUDE (id, password, google_two_fa_key);
+"""
+
+create_accounts_login_unique_index = """
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS accounts_login_unique_idx ON accounts (login);
+"""
+
+drop_accounts_login_unique_index = """
+DROP INDEX CONCURRENTLY IF EXISTS accounts_login_unique_idx;
+"""
@@ -14,16 +14,8 @@ class Account:
 
     @classmethod
     def serialize(cls, rows) -> list["Account"]:
-        return [
-            cls(
-                id=row.id,
-                login=row.login,
-                password=row.password,
-                google_two_fa_key=row.google_two_fa_key,
-                created_at=row.created_at,
-            )
-            for row in rows
-        ]
+        # Порядок колонок в запросах совпадает с порядком полей
+        return [cls(*row) for row in rows]
 
     def to_dict(self) -> dict:
         return {
@@ -33,3 +25,26 @@ class Account:
             "google_two_fa_key": self.google_two_fa_key,
             "created_at": self.created_at.isoformat(),
         }
+
+
+@dataclass(frozen=True, slots=True)
+class AccountCredentials:
+    id: int
+
+    password: str
+    google_two_fa_key: str
+
+    @classmethod
+    def serialize(cls, rows) -> list["AccountCredentials"]:
+        return [cls(*row) for row in rows]
+
+
+@dataclass(frozen=True, slots=True)
+class AccountTwoFa:
+    id: int
+
+    google_two_fa_key: str
+
+    @classmethod
+    def serialize(cls, rows) -> list["AccountTwoFa"]:
+        return [cls(*row) for row in rows]
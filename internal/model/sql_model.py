@@ -10,6 +10,12 @@ CREATE TABLE IF NOT EXISTS accounts (
 );
 """
 
+create_accounts_login_covering_index = """
+CREATE UNIQUE INDEX IF NOT EXISTS accounts_login_covering_idx
+ON accounts (login)
+INCLUDE (id, password, google_two_fa_key);
+"""
+
 drop_account_table = """
 DROP TABLE IF EXISTS accounts CASCADE;
 """
@@ -17,6 +23,7 @@ DROP TABLE IF EXISTS accounts CASCADE;
 
 create_tables_queries = [
     create_account_table,
+    create_accounts_login_covering_index,
 ]
 
 drop_queries = [
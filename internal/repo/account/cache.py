@@ -0,0 +1,129 @@
+import struct
+
+from internal import common, interface, model
+
+# При смене формата записи поднимаем версию ключа, старые записи истекут по TTL
+KEY_VERSION = "v1"
+
+# id, длина хеша пароля; следом хеш пароля и ключ 2FA до конца записи
+_HEADER = struct.Struct(">qH")
+
+# Версия аккаунта должна пережить любое чтение из БД, начатое до ее изменения
+_VERSION_TTL = 86400
+
+# Запись только если версия аккаунта не менялась с момента, когда ее прочитали перед запросом в БД.
+# KEYS: ключ записи, ключ версии. ARGV: прочитанная версия, значение, TTL
+SET_IF_VERSION_SCRIPT = """
+local version = redis.call('GET', KEYS[2]) or '0'
+if version ~= ARGV[1] then
+    return 0
+end
+redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+return 1
+"""
+
+# KEYS: пары (ключ записи, ключ версии). ARGV: TTL версии
+INVALIDATE_SCRIPT = """
+for i = 1, #KEYS, 2 do
+    redis.call('DEL', KEYS[i])
+    redis.call('INCR', KEYS[i + 1])
+    redis.call('EXPIRE', KEYS[i + 1], ARGV[1])
+end
+return 0
+"""
+
+
+class AccountCache:
+    def __init__(
+        self,
+        tel: interface.ITelemetry,
+        redis_client: interface.IRedis,
+        ttl: int,
+    ):
+        self.logger = tel.logger()
+        self.redis_client = redis_client
+        self.ttl = ttl
+
+        meter = tel.meter()
+        self.hits = meter.create_counter(
+            "account_cache.hit",
+            description="Количество чтений аккаунта, обслуженных из кэша",
+        )
+        self.misses = meter.create_counter(
+            "account_cache.miss",
+            description="Количество чтений аккаунта, ушедших в БД",
+        )
+        self.invalidate_errors = meter.create_counter(
+            "account_cache.invalidate_error",
+            description="Количество неудачных инвалидаций кэша аккаунтов",
+        )
+
+    async def get(self, account_id: int) -> model.AccountCredentials | None:
+        try:
+            value = await self.redis_client.get_bytes(self._key(account_id))
+        except Exception as err:
+            self.logger.warning("Кэш аккаунтов недоступен", {common.ERROR_KEY: str(err)})
+            value = None
+
+        if value is None:
+            self.misses.add(1)
+            return None
+
+        self.hits.add(1)
+        return _decode(value)
+
+    async def version(self, account_id: int) -> str:
+        # Читается до запроса в БД и передается в set
+        try:
+            value = await self.redis_client.get(self._version_key(account_id))
+        except Exception as err:
+            self.logger.warning("Кэш аккаунтов недоступен", {common.ERROR_KEY: str(err)})
+            value = None
+        return "0" if value is None else str(value)
+
+    async def set(self, account: model.AccountCredentials, version: str) -> None:
+        # Строка, прочитанная до смены пароля или 2FA, не должна вернуться в кэш после инвалидации
+        try:
+            await self.redis_client.run_script(
+                SET_IF_VERSION_SCRIPT,
+                [self._key(account.id), self._version_key(account.id)],
+                [version, _encode(account), self.ttl],
+            )
+        except Exception as err:
+            self.logger.warning("Не удалось записать аккаунт в кэш", {common.ERROR_KEY: str(err)})
+
+    async def invalidate(self, *account_ids: int) -> None:
+        keys = []
+        for account_id in account_ids:
+            keys.extend([self._key(account_id), self._version_key(account_id)])
+
+        try:
+            await self.redis_client.run_script(INVALIDATE_SCRIPT, keys, [_VERSION_TTL])
+        except Exception as err:
+            # Изменение уже закоммичено, ошибка Redis не должна превращать его в 500.
+            # Уровень ERROR, чтобы пришел алерт: устаревший пароль или ключ 2FA остаются в кэше до TTL
+            self.invalidate_errors.add(1)
+            self.logger.error("Не удалось инвалидировать кэш аккаунтов", {common.ERROR_KEY: str(err)})
+
+    @staticmethod
+    def _key(account_id: int) -> str:
+        return f"account:{KEY_VERSION}:{account_id}"
+
+    @staticmethod
+    def _version_key(account_id: int) -> str:
+        return f"account:{KEY_VERSION}:{account_id}:version"
+
+
+def _encode(account: model.AccountCredentials) -> bytes:
+    password = account.password.encode("utf-8")
+    return _HEADER.pack(account.id, len(password)) + password + account.google_two_fa_key.encode("utf-8")
+
+
+def _decode(value: bytes) -> model.AccountCredentials:
+    account_id, password_size = _HEADER.unpack_from(value)
+    password_end = _HEADER.size + password_size
+    return model.AccountCredentials(
+        account_id,
+        value[_HEADER.size : password_end].decode("utf-8"),
+        value[password_end:].decode("utf-8"),
+    )
@@ -1,6 +1,12 @@
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
 from internal import common, interface, model
+from pkg.batch_loader import BatchLoader
+from pkg.single_flight import SingleFlight
 from pkg.trace_wrapper import traced_method
 
+from .cache import AccountCache
 from .sql_query import *
 
 
@@ -9,52 +15,110 @@ class AccountRepo(interface.IAccountRepo):
         self,
         tel: interface.ITelemetry,
         db: interface.IDB,
+        redis_client: interface.IRedis,
+        cache_ttl: int = 300,
+        batch_window: float = 0,
     ):
         self.tracer = tel.tracer()
         self.db = db
+        self.account_cache = AccountCache(tel, redis_client, cache_ttl)
+
+        # Запросы по id, пришедшие одновременно, объединяются в один WHERE id = ANY(:account_ids)
+        self.account_loader = BatchLoader(tel, "account", self._load_accounts, batch_window)
+        self.credentials_loader = BatchLoader(tel, "account_credentials", self._load_credentials, batch_window)
+
+        # Одинаковые чтения, выполняющиеся одновременно, делят один запрос к БД
+        self.single_flight = SingleFlight(tel, "account_repo")
+
+        # Транзакция -> id аккаунтов, которые нужно убрать из кэша после коммита
+        self._invalidate_on_commit: dict[interface.ITransaction, set[int]] = {}
+
+    @asynccontextmanager
+    async def transaction(self) -> AsyncIterator[interface.ITransaction]:
+        account_ids: set[int] = set()
+        async with self.db.transaction() as tx:
+            self._invalidate_on_commit[tx] = account_ids
+            try:
+                yield tx
+            finally:
+                del self._invalidate_on_commit[tx]
+
+        # До коммита параллельное чтение успело бы вернуть в кэш старую строку
+        if account_ids:
+            await self.account_cache.invalidate(*account_ids)
 
     @traced_method()
     async def create_account(self, login: str, password: str) -> int:
-        existing_accounts = await self.account_by_login(login)
-        if existing_accounts:
-            raise common.ErrAccountCreate()
-
         args = {
             "login": login,
             "password": password,
         }
 
+        # ON CONFLICT DO NOTHING не возвращает строк, если логин уже занят
         account_id = await self.db.insert(create_account, args)
+        if account_id is None:
+            raise common.ErrAccountCreate()
 
         return account_id
 
     @traced_method()
     async def account_by_id(self, account_id: int) -> list[model.Account]:
-        args = {"account_id": account_id}
-        rows = await self.db.select(get_account_by_id, args)
-        accounts = model.Account.serialize(rows) if rows else []
-
-        return accounts
+        account = await self.single_flight.do(
+            ("account_by_id", account_id), lambda: self.account_loader.load(account_id)
+        )
+        return [account] if account else []
 
     @traced_method()
     async def account_by_login(self, login: str) -> list[model.Account]:
         args = {"login": login}
-        rows = await self.db.select(get_account_by_login, args)
+        rows = await self.single_flight.do(
+            ("account_by_login", login), lambda: self.db.select(get_account_by_login, args)
+        )
         accounts = model.Account.serialize(rows) if rows else []
         return accounts
 
     @traced_method()
-    async def set_two_fa_key(self, account_id: int, google_two_fa_key: str) -> None:
+    async def account_credentials_by_id(self, account_id: int) -> list[model.AccountCredentials]:
+        account = await self._cached_credentials(account_id)
+        return [account] if account else []
+
+    @traced_method()
+    async def account_credentials_by_login(self, login: str) -> list[model.AccountCredentials]:
+        args = {"login": login}
+        rows = await self.single_flight.do(
+            ("account_credentials_by_login", login), lambda: self.db.select(get_account_credentials_by_login, args)
+        )
+        return model.AccountCredentials.serialize(rows) if rows else []
+
+    @traced_method()
+    async def account_two_fa_by_id(
+        self, account_id: int, tx: interface.ITransaction | None = None
+    ) -> list[model.AccountTwoFa]:
+        if tx is None:
+            account = await self._cached_credentials(account_id)
+            return [model.AccountTwoFa(account.id, account.google_two_fa_key)] if account else []
+
+        # Внутри транзакции блокируем строку до конца read-modify-write
+        args = {"account_id": account_id}
+        rows = await tx.select(get_account_two_fa_by_id_for_update, args)
+        return model.AccountTwoFa.serialize(rows) if rows else []
+
+    @traced_method()
+    async def set_two_fa_key(
+        self, account_id: int, google_two_fa_key: str, tx: interface.ITransaction | None = None
+    ) -> None:
         args = {
             "account_id": account_id,
             "google_two_fa_key": google_two_fa_key,
         }
-        await self.db.update(set_two_fa_key, args)
+        await (tx or self.db).update(set_two_fa_key, args)
+        await self._invalidate(account_id, tx)
 
     @traced_method()
-    async def delete_two_fa_key(self, account_id: int) -> None:
+    async def delete_two_fa_key(self, account_id: int, tx: interface.ITransaction | None = None) -> None:
         args = {"account_id": account_id}
-        await self.db.update(delete_two_fa_key, args)
+        await (tx or self.db).update(delete_two_fa_key, args)
+        await self._invalidate(account_id, tx)
 
     @traced_method()
     async def update_password(self, account_id: int, new_password: str) -> None:
@@ -63,3 +127,47 @@ class AccountRepo(interface.IAccountRepo):
             "new_password": new_password,
         }
         await self.db.update(update_password, args)
+        await self.account_cache.invalidate(account_id)
+
+    @traced_method()
+    async def update_password_if_unchanged(self, account_id: int, old_password: str, new_password: str) -> bool:
+        args = {
+            "account_id": account_id,
+            "old_password": old_password,
+            "new_password": new_password,
+        }
+        rows = await self.db.update(update_password_if_unchanged, args)
+        if rows:
+            await self.account_cache.invalidate(account_id)
+        return bool(rows)
+
+    async def _cached_credentials(self, account_id: int) -> model.AccountCredentials | None:
+        account = await self.account_cache.get(account_id)
+        if account is not None:
+            return account
+
+        return await self.single_flight.do(
+            ("account_credentials_by_id", account_id), lambda: self._load_and_cache_credentials(account_id)
+        )
+
+    async def _load_and_cache_credentials(self, account_id: int) -> model.AccountCredentials | None:
+        # Версию читаем до запроса в БД: если аккаунт изменят после него, set не запишет старую строку
+        version = await self.account_cache.version(account_id)
+        account = await self.credentials_loader.load(account_id)
+        if account is not None:
+            await self.account_cache.set(account, version)
+        return account
+
+    async def _invalidate(self, account_id: int, tx: interface.ITransaction | None) -> None:
+        if tx is None:
+            await self.account_cache.invalidate(account_id)
+        else:
+            self._invalidate_on_commit[tx].add(account_id)
+
+    async def _load_accounts(self, account_ids: list[int]) -> dict[int, model.Account]:
+        rows = await self.db.select(get_accounts_by_ids, {"account_ids": account_ids})
+        return {account.id: account for account in model.Account.serialize(rows)}
+
+    async def _load_credentials(self, account_ids: list[int]) -> dict[int, model.AccountCredentials]:
+        rows = await self.db.select(get_accounts_credentials_by_ids, {"account_ids": account_ids})
+        return {account.id: account for account in model.AccountCredentials.serialize(rows)}
@@ -9,19 +9,36 @@ VALUES (
     :password,
     ''
 )
+ON CONFLICT (login) DO NOTHING
 RETURNING id;
 """
 
-get_account_by_id = """
-SELECT * FROM accounts
-WHERE id = :account_id;
+get_accounts_by_ids = """
+SELECT id, login, password, google_two_fa_key, created_at FROM accounts
+WHERE id = ANY(:account_ids);
 """
 
 get_account_by_login = """
-SELECT * FROM accounts
+SELECT id, login, password, google_two_fa_key, created_at FROM accounts
 WHERE login = :login;
 """
 
+get_accounts_credentials_by_ids = """
+SELECT id, password, google_two_fa_key FROM accounts
+WHERE id = ANY(:account_ids);
+"""
+
+get_account_credentials_by_login = """
+SELECT id, password, google_two_fa_key FROM accounts
+WHERE login = :login;
+"""
+
+get_account_two_fa_by_id_for_update = """
+SELECT id, google_two_fa_key FROM accounts
+WHERE id = :account_id
+FOR UPDATE;
+"""
+
 set_two_fa_key = """
 UPDATE accounts
 SET google_two_fa_key = :google_two_fa_key
@@ -39,3 +56,24 @@ UPDATE accounts
 SET password = :new_password
 WHERE id = :account_id;
 """
+
+update_password_if_unchanged = """
+UPDATE accounts
+SET password = :new_password
+WHERE id = :account_id AND password = :old_password
+RETURNING id;
+"""
+
+# Именованные горячие запросы: asyncpg подготавливает их для каждого соединения, PG подписывает ими метрики
+prepared_queries = {
+    "create_account": create_account,
+    "get_accounts_by_ids": get_accounts_by_ids,
+    "get_account_by_login": get_account_by_login,
+    "get_accounts_credentials_by_ids": get_accounts_credentials_by_ids,
+    "get_account_credentials_by_login": get_account_credentials_by_login,
+    "get_account_two_fa_by_id_for_update": get_account_two_fa_by_id_for_update,
+    "set_two_fa_key": set_two_fa_key,
+    "delete_two_fa_key": delete_two_fa_key,
+    "update_password": update_password,
+    "update_password_if_unchanged": update_password_if_unchanged,
+}
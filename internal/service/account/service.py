@@ -1,10 +1,12 @@
+import asyncio
 import io
+import secrets
 
-import bcrypt
 import pyotp
 import qrcode
 
 from internal import common, interface, model
+from pkg.admission_controller import AdmissionController
 from pkg.trace_wrapper import traced_method
 
 
@@ -14,17 +16,26 @@ class AccountService(interface.IAccountService):
         tel: interface.ITelemetry,
         account_repo: interface.IAccountRepo,
         loom_authorization_client: interface.ILoomAuthorizationClient,
+        password_hasher: interface.IPasswordHasher,
+        password_hash_admission: AdmissionController,
         password_secret_key: str,
     ):
         self.tracer = tel.tracer()
         self.logger = tel.logger()
         self.account_repo = account_repo
         self.loom_authorization_client = loom_authorization_client
+        self.password_hasher = password_hasher
+        self.password_hash_admission = password_hash_admission
         self.password_secret_key = password_secret_key
 
+        # Ссылки на фоновые задачи, чтобы их не собрал GC до завершения
+        self._background_tasks: set[asyncio.Task] = set()
+        # Хеш, с которым сверяется пароль несуществующего аккаунта
+        self._dummy_password_hash: str | None = None
+
     @traced_method()
     async def register(self, login: str, password: str) -> model.AuthorizationDataDTO:
-        hashed_password = self.__hash_password(password)
+        hashed_password = await self.__hash_password(password)
         account_id = await self.account_repo.create_account(login, hashed_password)
 
         jwt_token = await self.loom_authorization_client.authorization(account_id, False, "employee")
@@ -37,7 +48,7 @@ class AccountService(interface.IAccountService):
 
     @traced_method()
     async def register_from_tg(self, login: str, password: str) -> model.AuthorizationDataDTO:
-        hashed_password = self.__hash_password(password)
+        hashed_password = await self.__hash_password(password)
         account_id = await self.account_repo.create_account(login, hashed_password)
 
         jwt_token = await self.loom_authorization_client.authorization_tg(account_id, False, "employee")
@@ -50,16 +61,23 @@ class AccountService(interface.IAccountService):
 
     @traced_method()
     async def login(self, login: str, password: str) -> model.AuthorizationDataDTO | None:
-        account = await self.account_repo.account_by_login(login)
+        account = await self.account_repo.account_credentials_by_login(login)
         if not account:
+            # Ответ и время ответа те же, что при неверном пароле, иначе по /login можно перебирать логины
             self.logger.info("Аккаунт не найден")
-            raise common.ErrAccountNotFound()
+            await self.__verify_password(await self.__dummy_password_hash(), password)
+            raise common.ErrInvalidPassword()
         account = account[0]
 
-        if not self.__verify_password(account.password, password):
+        if not await self.__verify_password(account.password, password):
             self.logger.info("Неверный пароль")
             raise common.ErrInvalidPassword()
 
+        if self.password_hasher.needs_rehash(account.password):
+            task = asyncio.create_task(self.__rehash_password(account.id, account.password, password))
+            self._background_tasks.add(task)
+            task.add_done_callback(self._background_tasks.discard)
+
         jwt_token = await self.loom_authorization_client.authorization(
             account.id, True if account.google_two_fa_key else False, "employee"
         )
@@ -85,36 +103,38 @@ class AccountService(interface.IAccountService):
 
     @traced_method()
     async def set_two_fa_key(self, account_id: int, google_two_fa_key: str, google_two_fa_code: str) -> None:
-        account = (await self.account_repo.account_by_id(account_id))[0]
+        async with self.account_repo.transaction() as tx:
+            account = (await self.account_repo.account_two_fa_by_id(account_id, tx))[0]
 
-        if account.google_two_fa_key:
-            self.logger.info("2FA уже включена")
-            raise common.ErrTwoFaAlreadyEnabled()
+            if account.google_two_fa_key:
+                self.logger.info("2FA уже включена")
+                raise common.ErrTwoFaAlreadyEnabled()
 
-        is_two_fa_verified = self.__verify_two_fa(google_two_fa_code, google_two_fa_key)
-        if not is_two_fa_verified:
-            self.logger.info("Неверный код 2FA")
-            raise common.ErrTwoFaCodeInvalid()
+            is_two_fa_verified = self.__verify_two_fa(google_two_fa_code, google_two_fa_key)
+            if not is_two_fa_verified:
+                self.logger.info("Неверный код 2FA")
+                raise common.ErrTwoFaCodeInvalid()
 
-        await self.account_repo.set_two_fa_key(account_id, google_two_fa_key)
+            await self.account_repo.set_two_fa_key(account_id, google_two_fa_key, tx)
 
     @traced_method()
     async def delete_two_fa_key(self, account_id: int, google_two_fa_code: str) -> None:
-        account = (await self.account_repo.account_by_id(account_id))[0]
-        if not account.google_two_fa_key:
-            self.logger.info("2FA не включена")
-            raise common.ErrTwoFaNotEnabled()
+        async with self.account_repo.transaction() as tx:
+            account = (await self.account_repo.account_two_fa_by_id(account_id, tx))[0]
+            if not account.google_two_fa_key:
+                self.logger.info("2FA не включена")
+                raise common.ErrTwoFaNotEnabled()
 
-        is_two_fa_verified = self.__verify_two_fa(google_two_fa_code, account.google_two_fa_key)
-        if not is_two_fa_verified:
-            self.logger.info("Неверный код 2FA")
-            raise common.ErrTwoFaCodeInvalid()
+            is_two_fa_verified = self.__verify_two_fa(google_two_fa_code, account.google_two_fa_key)
+            if not is_two_fa_verified:
+                self.logger.info("Неверный код 2FA")
+                raise common.ErrTwoFaCodeInvalid()
 
-        await self.account_repo.delete_two_fa_key(account_id)
+            await self.account_repo.delete_two_fa_key(account_id, tx)
 
     @traced_method()
     async def verify_two(self, account_id: int, google_two_fa_code: str) -> bool:
-        account = (await self.account_repo.account_by_id(account_id))[0]
+        account = (await self.account_repo.account_two_fa_by_id(account_id))[0]
         if not account.google_two_fa_key:
             self.logger.info("2FA не включена")
             raise common.ErrTwoFaNotEnabled()
@@ -124,30 +144,53 @@ class AccountService(interface.IAccountService):
 
     @traced_method()
     async def recovery_password(self, account_id: int, new_password: str) -> None:
-        new_hashed_password = self.__hash_password(new_password)
+        new_hashed_password = await self.__hash_password(new_password)
         await self.account_repo.update_password(account_id, new_hashed_password)
 
     @traced_method()
     async def change_password(self, account_id: int, new_password: str, old_password: str) -> None:
-        account = (await self.account_repo.account_by_id(account_id))[0]
+        account = (await self.account_repo.account_credentials_by_id(account_id))[0]
 
-        if not self.__verify_password(account.password, old_password):
+        if not await self.__verify_password(account.password, old_password):
             self.logger.info("Неверный старый пароль")
             raise common.ErrInvalidPassword()
 
-        new_hashed_password = self.__hash_password(new_password)
-        await self.account_repo.update_password(account_id, new_hashed_password)
+        # Транзакцию на время bcrypt не держим: пароль обновится, только если его не сменили параллельно
+        new_hashed_password = await self.__hash_password(new_password)
+        is_updated = await self.account_repo.update_password_if_unchanged(
+            account_id, account.password, new_hashed_password
+        )
+        if not is_updated:
+            self.logger.info("Пароль был изменен параллельным запросом")
+            raise common.ErrInvalidPassword()
+
+    async def drain(self, max_wait: float) -> None:
+        # Дожидаемся фоновых перехеширований, чтобы не потерять их при остановке
+        if self._background_tasks:
+            await asyncio.wait(set(self._background_tasks), timeout=max_wait)
 
-    def __verify_password(self, hashed_password: str, password: str) -> bool:
+    async def __rehash_password(self, account_id: int, hashed_password: str, password: str) -> None:
+        try:
+            new_hashed_password = await self.__hash_password(password)
+            await self.account_repo.update_password_if_unchanged(account_id, hashed_password, new_hashed_password)
+        except Exception as err:
+            self.logger.warning("Не удалось перехешировать пароль", {common.ERROR_KEY: str(err)})
+
+    async def __verify_password(self, hashed_password: str, password: str) -> bool:
         peppered_password = self.password_secret_key + password
-        return bcrypt.checkpw(peppered_password.encode("utf-8"), hashed_password.encode("utf-8"))
+        async with self.password_hash_admission.admit():
+            return await self.password_hasher.verify(hashed_password, peppered_password)
+
+    async def __dummy_password_hash(self) -> str:
+        if self._dummy_password_hash is None:
+            self._dummy_password_hash = await self.__hash_password(secrets.token_urlsafe(16))
+        return self._dummy_password_hash
 
     def __verify_two_fa(self, two_fa_code: str, two_fa_key: str) -> bool:
         totp = pyotp.TOTP(two_fa_key)
         return totp.verify(two_fa_code)
 
-    def __hash_password(self, password: str) -> str:
+    async def __hash_password(self, password: str) -> str:
         peppered_password = self.password_secret_key + password
-        hashed_password = bcrypt.hashpw(peppered_password.encode("utf-8"), bcrypt.gensalt())
-
-        return hashed_password.decode("utf-8")
+        async with self.password_hash_admission.admit():
+            return await self.password_hasher.hash(peppered_password)
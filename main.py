@@ -1,92 +1,293 @@
+import gc
+import math
+import os
 from contextvars import ContextVar
 
 import uvicorn
+from fastapi import FastAPI
 
+from infrastructure.password_hasher.password_hasher import PasswordHasher, calibrate_cost
+from infrastructure.pg.asyncpg_pg import AsyncpgPG
 from infrastructure.pg.pg import PG
+from infrastructure.rate_limiter.rate_limiter import RateLimit, RateLimiter
+from infrastructure.redis_client.redis_client import RedisClient
 from infrastructure.telemetry.telemetry import AlertManager, Telemetry
 from internal.app.http.app import NewHTTP
+from internal.app.http.lifespan import Lifespan
 from internal.config.config import Config
 from internal.controller.http.handler.account.handler import AccountController
+from internal.controller.http.middlerware.authorization_cache import AuthorizationCache
 from internal.controller.http.middlerware.middleware import HttpMiddleware
+from internal.repo.account import sql_query as account_sql_query
 from internal.repo.account.repo import AccountRepo
 from internal.service.account.service import AccountService
+from pkg.admission_controller import AdmissionController
 from pkg.client.internal.loom_authorization.client import LoomAuthorizationClient
 
 cfg = Config()
 
-log_context: ContextVar[dict] = ContextVar("log_context", default={})
-
-alert_manager = AlertManager(
-    cfg.alert_tg_bot_token,
-    cfg.service_name,
-    cfg.alert_tg_chat_id,
-    cfg.alert_tg_chat_thread_id,
-    cfg.grafana_url,
-    cfg.monitoring_redis_host,
-    cfg.monitoring_redis_port,
-    cfg.monitoring_redis_db,
-    cfg.monitoring_redis_password,
-)
-
-tel = Telemetry(
-    cfg.log_level,
-    cfg.root_path,
-    cfg.environment,
-    cfg.service_name,
-    cfg.service_version,
-    cfg.otlp_host,
-    cfg.otlp_port,
-    log_context,
-    alert_manager,
-)
-
-# Инициализация клиентов
-db = PG(tel, cfg.db_user, cfg.db_pass, cfg.db_host, cfg.db_port, cfg.db_name)
-
-# Инициализация клиентов
-loom_authorization_client = LoomAuthorizationClient(
-    tel=tel,
-    host=cfg.loom_authorization_host,
-    port=cfg.loom_authorization_port,
-    log_context=log_context,
-)
-
-# Инициализация репозиториев
-account_repo = AccountRepo(tel, db)
-
-# Инициализация сервисов
-account_service = AccountService(
-    tel=tel,
-    account_repo=account_repo,
-    loom_authorization_client=loom_authorization_client,
-    password_secret_key=cfg.password_secret_key,
-)
-
-# Инициализация контроллеров
-account_controller = AccountController(tel, account_service)
-
-# Инициализация middleware
-http_middleware = HttpMiddleware(tel, loom_authorization_client, cfg.prefix, log_context)
-
-app = NewHTTP(
-    db=db,
-    account_controller=account_controller,
-    http_middleware=http_middleware,
-    prefix=cfg.prefix,
-    environment=cfg.environment,
-)
+
+def create_app() -> FastAPI:
+    log_context: ContextVar[dict] = ContextVar("log_context", default={})
+
+    alert_manager = AlertManager(
+        cfg.alert_tg_bot_token,
+        cfg.service_name,
+        cfg.alert_tg_chat_id,
+        cfg.alert_tg_chat_thread_id,
+        cfg.grafana_url,
+        cfg.monitoring_redis_host,
+        cfg.monitoring_redis_port,
+        cfg.monitoring_redis_db,
+        cfg.monitoring_redis_password,
+        dedup_ttl=cfg.alert_dedup_ttl,
+        queue_size=cfg.alert_queue_size,
+        workers=cfg.alert_workers,
+        digest_window=cfg.alert_digest_window,
+        analysis_cache_ttl=cfg.alert_analysis_cache_ttl,
+        tg_rate_per_minute=cfg.alert_tg_rate_per_minute,
+    )
+
+    tel = Telemetry(
+        cfg.log_level,
+        cfg.root_path,
+        cfg.environment,
+        cfg.service_name,
+        cfg.service_version,
+        cfg.otlp_host,
+        cfg.otlp_port,
+        log_context,
+        alert_manager,
+        trace_sample_ratio=cfg.trace_sample_ratio,
+        tail_sampling=cfg.trace_tail_sampling,
+        tail_sampling_latency_threshold=cfg.trace_tail_latency_threshold_ms / 1000,
+        log_queue_size=cfg.log_queue_size,
+        log_queue_overflow=cfg.log_queue_overflow,
+    )
+
+    # Инициализация клиентов
+    if cfg.db_engine == "asyncpg":
+        db = AsyncpgPG(
+            tel,
+            cfg.db_user,
+            cfg.db_pass,
+            cfg.db_host,
+            cfg.db_port,
+            cfg.db_name,
+            prepared_queries=account_sql_query.prepared_queries,
+            pool_size=cfg.db_pool_size,
+            max_overflow=cfg.db_max_overflow,
+            pool_recycle=cfg.db_pool_recycle,
+            pool_timeout=cfg.db_pool_timeout,
+        )
+    else:
+        db = PG(
+            tel,
+            cfg.db_user,
+            cfg.db_pass,
+            cfg.db_host,
+            cfg.db_port,
+            cfg.db_name,
+            pool_size=cfg.db_pool_size,
+            max_overflow=cfg.db_max_overflow,
+            pool_recycle=cfg.db_pool_recycle,
+            pool_timeout=cfg.db_pool_timeout,
+            query_names=account_sql_query.prepared_queries,
+        )
+    redis_client = RedisClient(cfg.redis_host, cfg.redis_port, cfg.redis_db, cfg.redis_password)
+
+    # Инициализация клиентов
+    loom_authorization_client = LoomAuthorizationClient(
+        tel=tel,
+        host=cfg.loom_authorization_host,
+        port=cfg.loom_authorization_port,
+        log_context=log_context,
+    )
+
+    password_hasher = PasswordHasher(
+        tel=tel,
+        backend=cfg.password_hasher_backend,
+        max_workers=cfg.password_hasher_workers,
+        cost=cfg.password_hash_cost,
+    )
+
+    password_hash_admission = AdmissionController(
+        tel=tel,
+        name="password_hash",
+        max_in_flight=cfg.password_hash_max_in_flight,
+        max_queue_wait=cfg.password_hash_max_queue_wait_ms / 1000,
+    )
+
+    # Инициализация репозиториев
+    account_repo = AccountRepo(
+        tel,
+        db,
+        redis_client,
+        cache_ttl=cfg.account_cache_ttl,
+        batch_window=cfg.db_batch_window_ms / 1000,
+    )
+
+    # Инициализация сервисов
+    account_service = AccountService(
+        tel=tel,
+        account_repo=account_repo,
+        loom_authorization_client=loom_authorization_client,
+        password_hasher=password_hasher,
+        password_hash_admission=password_hash_admission,
+        password_secret_key=cfg.password_secret_key,
+    )
+
+    rate_limiter = RateLimiter(
+        tel=tel,
+        redis_client=redis_client,
+        limits={
+            "login": RateLimit(cfg.rate_limit_login_per_minute, cfg.rate_limit_login_burst),
+            "client": RateLimit(cfg.rate_limit_client_per_minute, cfg.rate_limit_client_burst),
+            "account": RateLimit(cfg.rate_limit_account_per_minute, cfg.rate_limit_account_burst),
+        },
+    )
+
+    # Инициализация контроллеров
+    account_controller = AccountController(
+        tel, account_service, rate_limiter, trusted_proxy_count=cfg.trusted_proxy_count
+    )
+
+    # Инициализация middleware
+    authorization_cache = AuthorizationCache(
+        tel=tel,
+        loom_authorization_client=loom_authorization_client,
+        max_size=cfg.authorization_cache_size,
+        ttl=cfg.authorization_cache_ttl,
+        stale_ttl=cfg.authorization_cache_stale_ttl,
+    )
+    jwt_verifier = None
+    if cfg.authorization_backend == "jwt":
+        # PyJWT импортируется только при выбранной локальной проверке токенов
+        from internal.controller.http.middlerware.jwt_verifier import JwtVerifier
+
+        jwt_verifier = JwtVerifier(
+            tel=tel,
+            loom_authorization_client=loom_authorization_client,
+            authorization_cache=authorization_cache,
+            algorithms=cfg.authorization_jwt_algorithms,
+            jwks_refresh_interval=cfg.authorization_jwks_refresh_interval,
+        )
+    http_middleware = HttpMiddleware(
+        tel,
+        authorization_cache,
+        cfg.prefix,
+        log_context,
+        jwt_verifier=jwt_verifier,
+        revocation_check_paths=cfg.authorization_revocation_check_paths,
+    )
+
+    lifespan = Lifespan(
+        tel=tel,
+        db=db,
+        redis_client=redis_client,
+        loom_authorization_client=loom_authorization_client,
+        account_service=account_service,
+        password_hasher=password_hasher,
+        authorization_cache=authorization_cache,
+        jwt_verifier=jwt_verifier,
+        alert_manager=alert_manager,
+        warmup_connections=cfg.warmup_connections,
+        warmup_timeout=cfg.warmup_timeout,
+        drain_timeout=cfg.shutdown_drain_timeout,
+    )
+
+    return NewHTTP(
+        tel=tel,
+        db=db,
+        account_controller=account_controller,
+        http_middleware=http_middleware,
+        lifespan=lifespan,
+        prefix=cfg.prefix,
+        environment=cfg.environment,
+    )
+
+
+def calibrate_password_hash_cost() -> None:
+    # Один раз до запуска воркеров: стоимость, выбранная каждым воркером под своей нагрузкой,
+    # различалась бы между процессами
+    if cfg.password_hash_target_ms <= 0:
+        return
+    cost, duration = calibrate_cost(
+        cfg.password_hash_target_ms / 1000,
+        min_cost=cfg.password_hash_min_cost,
+        max_cost=cfg.password_hash_max_cost,
+    )
+    cfg.password_hash_cost = cost
+    print(f"Калибровка стоимости bcrypt: cost={cost}, duration={duration:.4f}s", flush=True)
+
+
+def run_gunicorn(options: dict) -> None:
+    # gunicorn нужен только в prod, dev запускается одним процессом uvicorn
+    from gunicorn.app.base import BaseApplication
+
+    class GunicornApplication(BaseApplication):
+        def __init__(self, options: dict):
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            # Вызывается в каждом воркере после fork: телеметрия, пулы БД и HTTP клиенты у каждого процесса свои
+            return create_app()
+
+    GunicornApplication(options).run()
+
+
+def http_workers() -> int:
+    if cfg.http_workers > 0:
+        return cfg.http_workers
+    return available_cpus()
+
+
+def available_cpus() -> int:
+    cpus = len(os.sched_getaffinity(0))
+    # affinity не учитывает лимит CPU контейнера, он задается квотой cgroup v2
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+    except (OSError, ValueError):
+        return cpus
+    if quota == "max":
+        return cpus
+    return max(1, min(cpus, math.ceil(int(quota) / int(period))))
+
 
 if __name__ == "__main__":
+    calibrate_password_hash_cost()
+
     if cfg.environment == "prod":
-        workers = 1
+        # Модули уже импортированы мастером и достаются воркерам copy-on-write.
+        # gc.freeze убирает их объекты из поколений сборщика, чтобы его проходы не копировали общие страницы
+        gc.collect()
+        gc.freeze()
+
+        run_gunicorn(
+            {
+                "bind": f"0.0.0.0:{cfg.http_port}",
+                "workers": http_workers(),
+                "worker_class": "uvicorn_worker.UvicornWorker",
+                "graceful_timeout": cfg.http_graceful_timeout,
+                "timeout": cfg.http_worker_timeout,
+                "keepalive": cfg.http_keepalive,
+            }
+        )
     else:
-        workers = 1
-
-    uvicorn.run(
-        "main:app",
-        host="0.0.0.0",
-        port=int(cfg.http_port),
-        workers=workers,
-        loop="uvloop",
-        access_log=False,
-    )
+        # Фабрика передается объектом: по строке uvicorn импортировал бы модуль заново, без откалиброванной стоимости
+        uvicorn.run(
+            create_app,
+            factory=True,
+            host="0.0.0.0",
+            port=int(cfg.http_port),
+            workers=1,
+            loop="uvloop",
+            access_log=False,
+            timeout_graceful_shutdown=cfg.http_graceful_timeout,
+        )
@@ -0,0 +1 @@
+from pkg.admission_controller.admission_controller import AdmissionController
@@ -0,0 +1,49 @@
+import asyncio
+import math
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
+from internal import common, interface
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        tel: interface.ITelemetry,
+        name: str,
+        max_in_flight: int,
+        max_queue_wait: float,
+    ):
+        self.name = name
+        self.max_in_flight = max_in_flight
+        self.max_queue_wait = max_queue_wait
+        self.retry_after = max(math.ceil(max_queue_wait), 1)
+
+        self._semaphore = asyncio.Semaphore(max_in_flight)
+
+        meter = tel.meter()
+        self.admitted = meter.create_counter(
+            "admission_controller.admitted",
+            description="Количество запросов, допущенных к выполнению",
+        )
+        self.shed = meter.create_counter(
+            "admission_controller.shed",
+            description="Количество запросов, отклоненных из-за перегрузки",
+        )
+
+    @asynccontextmanager
+    async def admit(self) -> AsyncIterator[None]:
+        if self._semaphore.locked():
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), timeout=self.max_queue_wait)
+            except TimeoutError:
+                self.shed.add(1, {"name": self.name})
+                raise common.ErrServiceOverloaded(self.retry_after) from None
+        else:
+            await self._semaphore.acquire()
+
+        self.admitted.add(1, {"name": self.name})
+        try:
+            yield
+        finally:
+            self._semaphore.release()
@@ -0,0 +1 @@
+from pkg.batch_loader.batch_loader import BatchLoader
@@ -0,0 +1,89 @@
+import asyncio
+from collections.abc import Awaitable, Callable, Hashable
+from typing import Any
+
+from internal import interface
+
+
+class BatchLoader:
+    def __init__(
+        self,
+        tel: interface.ITelemetry,
+        name: str,
+        load_batch: Callable[[list[Hashable]], Awaitable[dict[Hashable, Any]]],
+        window: float = 0,
+        max_batch_size: int = 100,
+    ):
+        self.name = name
+        self.load_batch = load_batch
+        self.window = window
+        self.max_batch_size = max_batch_size
+
+        self._pending: dict[Hashable, asyncio.Future] = {}
+        self._handle: asyncio.Handle | None = None
+        self._tasks: set[asyncio.Task] = set()
+
+        meter = tel.meter()
+        self.batch_size = meter.create_histogram(
+            "batch_loader.batch.size",
+            description="Количество ключей в одном запросе к источнику",
+        )
+        self.requests = meter.create_counter(
+            "batch_loader.requests",
+            description="Количество запрошенных ключей до объединения",
+        )
+
+    async def load(self, key: Hashable) -> Any:
+        self.requests.add(1, {"name": self.name})
+
+        future = self._pending.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._pending[key] = future
+
+            if len(self._pending) >= self.max_batch_size:
+                self._dispatch()
+            elif self._handle is None:
+                # Собираем ключи, запрошенные в пределах одного тика цикла событий или окна
+                if self.window > 0:
+                    self._handle = loop.call_later(self.window, self._dispatch)
+                else:
+                    self._handle = loop.call_soon(self._dispatch)
+
+        # shield: отмена одного ожидающего не должна отменять результат для остальных
+        return await asyncio.shield(future)
+
+    def _dispatch(self) -> None:
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+
+        batch, self._pending = self._pending, {}
+        if not batch:
+            return
+
+        task = asyncio.create_task(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: dict[Hashable, asyncio.Future]) -> None:
+        self.batch_size.record(len(batch), {"name": self.name})
+        try:
+            results = await self.load_batch(list(batch.keys()))
+        except Exception as err:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(err)
+                    # Исключение могут не забрать, если все ожидающие уже отменены
+                    future.add_done_callback(_consume_exception)
+            return
+
+        for key, future in batch.items():
+            if not future.done():
+                future.set_result(results.get(key))
+
+
+def _consume_exception(future: asyncio.Future) -> None:
+    if not future.cancelled():
+        future.exception()
@@ -1,3 +1,4 @@
+import asyncio
 from collections.abc import Callable
 from contextvars import ContextVar
 from datetime import datetime, timedelta
@@ -169,6 +170,11 @@ class AsyncHTTPClient:
             follow_redirects=True,
         )
 
+    async def warmup(self, connections: int, url: str = "") -> None:
+        # Одновременные запросы открывают отдельные соединения, которые затем остаются в keep-alive пуле.
+        # Статус ответа неважен, нужен только установленный TCP коннект
+        await asyncio.gather(*[self.session.head(url) for _ in range(connections)])
+
     async def close(self):
         if self.session and not self.session.is_closed:
             await self.session.aclose()
@@ -44,3 +44,14 @@ class LoomAuthorizationClient(interface.ILoomAuthorizationClient):
         json_response = response.json()
 
         return model.AuthorizationData(**json_response)
+
+    @traced_method(SpanKind.CLIENT)
+    async def jwks(self) -> dict:
+        response = await self.client.get("/jwks")
+        return response.json()
+
+    async def warmup(self, connections: int) -> None:
+        await self.client.warmup(connections)
+
+    async def close(self) -> None:
+        await self.client.close()
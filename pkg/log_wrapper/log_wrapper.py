@@ -4,6 +4,8 @@ import traceback
 from collections.abc import Callable
 from typing import Any
 
+from internal import common
+
 
 def auto_log():
     def decorator(func: Callable) -> Callable:
@@ -24,6 +26,11 @@ def auto_log():
                     logger.info(f"Завершение {class_name}.{method_name}")
 
                 return result
+            except common.ErrDomain as e:
+                # Ожидаемая ошибка: без traceback и уровня ERROR, который запускает алерт
+                if logger:
+                    logger.info(f"Завершение {class_name}.{method_name}: {str(e)}")
+                raise
             except Exception as e:
                 if logger:
                     logger.error(
@@ -51,6 +58,11 @@ def auto_log():
                     logger.info(f"Завершение {class_name}.{method_name}")
 
                 return result
+            except common.ErrDomain as e:
+                # Ожидаемая ошибка: без traceback и уровня ERROR, который запускает алерт
+                if logger:
+                    logger.info(f"Завершение {class_name}.{method_name}: {str(e)}")
+                raise
             except Exception as e:
                 if logger:
                     logger.error(
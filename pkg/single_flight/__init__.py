@@ -0,0 +1 @@
+from pkg.single_flight.single_flight import SingleFlight
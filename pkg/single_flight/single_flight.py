@@ -0,0 +1,59 @@
+import asyncio
+from collections.abc import Awaitable, Callable, Hashable
+from typing import Any
+
+from internal import interface
+
+
+class _Call:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    def __init__(self, tel: interface.ITelemetry, name: str):
+        self.name = name
+        self._calls: dict[Hashable, _Call] = {}
+
+        meter = tel.meter()
+        self.hits = meter.create_counter(
+            "single_flight.hit",
+            description="Количество вызовов, присоединившихся к уже выполняющемуся запросу",
+        )
+        self.misses = meter.create_counter(
+            "single_flight.miss",
+            description="Количество вызовов, запустивших новый запрос",
+        )
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        call = self._calls.get(key)
+        if call is None:
+            self.misses.add(1, {"name": self.name})
+            call = _Call(asyncio.ensure_future(func()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda _: self._forget(key, call))
+        else:
+            self.hits.add(1, {"name": self.name})
+
+        call.waiters += 1
+        try:
+            # shield: отмена одного ожидающего не должна отменять запрос для остальных
+            return await asyncio.shield(call.task)
+        except asyncio.CancelledError:
+            # Запрос отменяется, только когда его больше никто не ждет
+            if call.waiters == 1 and not call.task.done():
+                self._forget(key, call)
+                call.task.cancel()
+            raise
+        finally:
+            call.waiters -= 1
+
+    def _forget(self, key: Hashable, call: _Call) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
+        if call.task.done() and not call.task.cancelled():
+            # Исключение могут не забрать, если все ожидающие уже отменены
+            call.task.exception()
@@ -3,7 +3,14 @@ from collections.abc import Callable
 from functools import wraps
 from typing import Any
 
-from opentelemetry.trace import SpanKind, StatusCode
+from opentelemetry.trace import Span, SpanKind, StatusCode
+
+from internal import common
+
+# Бюджет длины строкового значения атрибута, остальное обрезается
+MAX_ATTRIBUTE_LENGTH = 256
+
+_REDACTED = "***REDACTED***"
 
 
 def traced_method(
@@ -12,69 +19,53 @@ def traced_method(
     if exclude_params is None:
         exclude_params = {"self", "cls"}
     if sensitive_params is None:
-        sensitive_params = {"password", "token", "secret", "api_key"}
+        # "_key" закрывает api_key и google_two_fa_key (seed TOTP), two_fa_status остается виден
+        sensitive_params = {"password", "token", "secret", "_key", "two_fa_code"}
 
     def decorator(func: Callable) -> Callable:
+        # Разбор сигнатуры выполняется один раз при декорировании, а не на каждый вызов
+        build_attributes = _attributes_builder(func, exclude_params, sensitive_params)
+        method_name = func.__name__
+
         @wraps(func)
         async def async_wrapper(self, *args, **kwargs):
-            # Получаем имя класса и метода
-            class_name = self.__class__.__name__
-            method_name = func.__name__
-            span_name = f"{class_name}.{method_name}"
-
-            # Собираем все параметры
-            sig = inspect.signature(func)
-            bound_args = sig.bind(self, *args, **kwargs)
-            bound_args.apply_defaults()
-
-            # Формируем атрибуты для span'а
-            attributes = {}
-            for param_name, param_value in bound_args.arguments.items():
-                if param_name in exclude_params:
-                    continue
-
-                # Маскируем чувствительные данные
-                if param_name in sensitive_params:
-                    attributes[param_name] = "***REDACTED***"
-                else:
-                    # Конвертируем значение в строку для атрибутов
-                    attributes[param_name] = _serialize_value(param_value)
-
-            # Создаем span
-            with self.tracer.start_as_current_span(span_name, kind=span_kind, attributes=attributes) as span:
+            span_name = f"{self.__class__.__name__}.{method_name}"
+
+            # Статус и исключение выставляем сами: ожидаемые ошибки домена не должны помечать span как ERROR
+            with self.tracer.start_as_current_span(
+                span_name, kind=span_kind, record_exception=False, set_status_on_exception=False
+            ) as span:
+                # Несэмплированный span атрибуты все равно отбросит, не тратим время на их сборку
+                if span.is_recording():
+                    span.set_attributes(build_attributes(self, args, kwargs))
                 try:
                     result = await func(self, *args, **kwargs)
                     span.set_status(StatusCode.OK)
                     return result
+                except common.ErrDomain as e:
+                    _record_domain_error(span, e)
+                    raise
                 except Exception as e:
                     span.set_status(StatusCode.ERROR, str(e))
+                    span.record_exception(e)
                     raise
 
         @wraps(func)
         def sync_wrapper(self, *args, **kwargs):
-            class_name = self.__class__.__name__
-            method_name = func.__name__
-            span_name = f"{class_name}.{method_name}"
+            span_name = f"{self.__class__.__name__}.{method_name}"
 
-            sig = inspect.signature(func)
-            bound_args = sig.bind(self, *args, **kwargs)
-            bound_args.apply_defaults()
-
-            attributes = {}
-            for param_name, param_value in bound_args.arguments.items():
-                if param_name in exclude_params:
-                    continue
-
-                if param_name in sensitive_params:
-                    attributes[param_name] = "***REDACTED***"
-                else:
-                    attributes[param_name] = _serialize_value(param_value)
-
-            with self.tracer.start_as_current_span(span_name, kind=span_kind, attributes=attributes) as span:
+            with self.tracer.start_as_current_span(
+                span_name, kind=span_kind, record_exception=False, set_status_on_exception=False
+            ) as span:
+                if span.is_recording():
+                    span.set_attributes(build_attributes(self, args, kwargs))
                 try:
                     result = func(self, *args, **kwargs)
                     span.set_status(StatusCode.OK)
                     return result
+                except common.ErrDomain as e:
+                    _record_domain_error(span, e)
+                    raise
                 except Exception as e:
                     span.set_status(StatusCode.ERROR, str(e))
                     span.record_exception(e)
@@ -89,15 +80,76 @@ def traced_method(
     return decorator
 
 
+def _record_domain_error(span: Span, err: common.ErrDomain) -> None:
+    # Ожидаемый отказ (неверный пароль, лимит, перегрузка) - не ошибка span'а, иначе tail-сэмплер
+    # сохранял бы каждый такой trace как раз во время перебора паролей или перегрузки
+    if span.is_recording():
+        span.add_event(
+            "domain_error",
+            {"error.type": err.__class__.__name__, "http.status_code": err.status_code},
+        )
+
+
+def _attributes_builder(
+    func: Callable, exclude_params: set[str], sensitive_params: set[str]
+) -> Callable[[Any, tuple, dict], dict]:
+    sig = inspect.signature(func)
+    params = list(sig.parameters.values())
+    # Маскируем по вхождению: new_password, old_password, access_token и т.п. тоже чувствительные
+    sensitive_names = {
+        param.name for param in params if any(sensitive in param.name.lower() for sensitive in sensitive_params)
+    }
+
+    if any(param.kind in (param.VAR_POSITIONAL, param.VAR_KEYWORD, param.POSITIONAL_ONLY) for param in params):
+        # *args, **kwargs и позиционные-only параметры разбираем честным bind
+        def build_bound(self, args: tuple, kwargs: dict) -> dict:
+            bound_args = sig.bind(self, *args, **kwargs)
+            bound_args.apply_defaults()
+            return {
+                name: _REDACTED if name in sensitive_names else _serialize_value(value)
+                for name, value in bound_args.arguments.items()
+                if name not in exclude_params
+            }
+
+        return build_bound
+
+    # (позиция среди args без self, имя, значение по умолчанию, маскировать ли)
+    plan = [
+        (index - 1, param.name, param.default, param.name in sensitive_names)
+        for index, param in enumerate(params)
+        if param.name not in exclude_params
+    ]
+
+    def build(self, args: tuple, kwargs: dict) -> dict:
+        attributes = {}
+        for position, name, default, is_sensitive in plan:
+            if position < 0:
+                value = self
+            elif position < len(args):
+                value = args[position]
+            elif name in kwargs:
+                value = kwargs[name]
+            elif default is not inspect.Parameter.empty:
+                value = default
+            else:
+                continue
+
+            # Маскируем чувствительные данные
+            attributes[name] = _REDACTED if is_sensitive else _serialize_value(value)
+        return attributes
+
+    return build
+
+
 def _serialize_value(value: Any) -> str:
     """Сериализует значение для атрибутов OpenTelemetry."""
     if value is None:
         return "None"
-    if isinstance(value, (str, int, float, bool)):
+    if isinstance(value, str):
+        return value if len(value) <= MAX_ATTRIBUTE_LENGTH else value[:MAX_ATTRIBUTE_LENGTH] + "..."
+    if isinstance(value, (int, float, bool)):
         return str(value)
     if isinstance(value, (list, tuple, dict)):
         return f"[{len(value)} items]"
-    if isinstance(value, dict):
-        return f"{{dict with {len(value)} keys}}"
 
     return f"<{value.__class__.__name__}>"